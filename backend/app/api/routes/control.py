@@ -1,15 +1,25 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
 from app.services.camera import Camera
+from app.services.cameras import CameraManager
 from app.models.hsv import HSVUpdate
 from app.models.shapes import SelectShapes, ShapeType
-from app.utils.helpers import get_json_settings, set_json_settings
-import json
+from app.utils.config import ConfigStore
 
 router = APIRouter(prefix='/control')
-cam = Camera()
+manager = CameraManager()
+store = ConfigStore()
+
+def get_camera(cam: Optional[str] = None) -> Camera:
+    """`cam` viene de la ruta (`/control/{cam}/...`) o es opcional (`/control/...`, primera cámara)."""
+    try:
+        return manager.get(cam)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Cámara desconocida: {cam}")
 
 @router.put("/update-hsv", tags=["control"])
-async def update_hsv(hsv: HSVUpdate):
+@router.put("/{cam}/update-hsv", tags=["control"])
+async def update_hsv(hsv: HSVUpdate, cam: Camera = Depends(get_camera)):
     try:
         # Crear los arrays lower y upper HSV
         lower_hsv = [hsv.lower_h, hsv.lower_s, hsv.lower_v]
@@ -25,7 +35,8 @@ async def update_hsv(hsv: HSVUpdate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/hsv", tags=["control"])
-async def hsv():
+@router.get("/{cam}/hsv", tags=["control"])
+async def hsv(cam: Camera = Depends(get_camera)):
 
     return {
         'lower_h': int(cam.hsv.lower_hsv[0]),
@@ -37,38 +48,35 @@ async def hsv():
     }
 
 @router.post("/reset-hsv", tags=["control"])
-async def reset_hsv():
+@router.post("/{cam}/reset-hsv", tags=["control"])
+async def reset_hsv(cam: Camera = Depends(get_camera)):
     cam.reset_hsv()
-    config = get_json_settings()
+    config = store.settings.camera(cam.cam_id)
 
-    lower_hsv = config['lower_hsv']
-    upper_hsv = config['upper_hsv']
+    lower_hsv = config.lower_hsv
+    upper_hsv = config.upper_hsv
 
     cam.set_hsv(lower=lower_hsv, upper=upper_hsv)
 
     return {"status": "success"}
 
 @router.post("/set-hsv", tags=["control"])
-async def set_hsv(hsv: HSVUpdate):
+@router.post("/{cam}/set-hsv", tags=["control"])
+async def set_hsv(hsv: HSVUpdate, cam: Camera = Depends(get_camera)):
     lower_hsv = [hsv.lower_h, hsv.lower_s, hsv.lower_v]
     upper_hsv = [hsv.upper_h, hsv.upper_s, hsv.upper_v]
 
-    config = get_json_settings()
-
-    config['lower_hsv'] = lower_hsv
-    config['upper_hsv'] = upper_hsv 
-
     cam.set_hsv(lower=lower_hsv, upper=upper_hsv)
 
-    set_json_settings(config)
+    # Se guarda en segundo plano: una ráfaga de cambios termina en una sola escritura
+    store.update_camera_later(cam.cam_id, lower_hsv=lower_hsv, upper_hsv=upper_hsv)
 
     return {"status": "success", "lower_hsv": lower_hsv, "upper_hsv": upper_hsv}   
 
 @router.put("/update-shape", tags=["control"])
-async def update_shape(shape: SelectShapes):
+@router.put("/{cam}/update-shape", tags=["control"])
+async def update_shape(shape: SelectShapes, cam: Camera = Depends(get_camera)):
     try:
-        config = get_json_settings()
-        
         if shape == SelectShapes.CIRCLE:
             cam.set_shape(ShapeType.CIRCLE.value)
         elif shape == SelectShapes.QUADRILATERAL:
@@ -78,9 +86,7 @@ async def update_shape(shape: SelectShapes):
         else: 
             raise HTTPException(status_code=400, detail="Invalid shape selection")
             
-        config['target_shape'] = str(cam.target_shape)
-
-        set_json_settings(config)
+        store.update_camera_later(cam.cam_id, target_shape=str(cam.target_shape))
             
         return {"status": "success", "shape": str(cam.target_shape)}
         
@@ -1,11 +1,36 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
+from app.api.routes.control import get_camera
 from app.services.camera import Camera
-from app.utils.helpers import get_json_settings
+from app.services.cameras import CameraManager
+from app.utils.config import ConfigStore
 
 router = APIRouter(prefix='/health')
-cam = Camera()
+manager = CameraManager()
+
+
+def camera_health(cam: Camera) -> dict:
+    """FPS, contadores del pipeline y p50/p95/p99 (ms) de cada etapa de una cámara."""
+    return {'pipeline': cam.pipeline, **cam.profiler.summary(), 'counters': cam.get_stats()}
+
+@router.get("", tags=["health"])
+async def health():
+    """Estado de cada cámara (ver `/health/{cam}`)."""
+    return {'default': manager.default_id, 'cameras': {cam.cam_id: camera_health(cam) for cam in manager}}
 
 @router.get("/check", tags=["health"])
 async def health_check():
-    
-    return get_json_settings()
+
+    return ConfigStore().as_dict()
+
+@router.put("/profiling", tags=["health"])
+@router.put("/{cam}/profiling", tags=["health"])
+async def set_profiling(
+    enabled: bool = Query(..., description="Medir los tiempos por etapa"),
+    cam: Camera = Depends(get_camera),
+):
+    cam.set_profiling(enabled)
+    return {'enabled': cam.profiler.enabled}
+
+@router.get("/{cam}", tags=["health"])
+async def health_camera(cam: Camera = Depends(get_camera)):
+    return camera_health(cam)
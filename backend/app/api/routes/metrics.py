@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.api.routes.video import streams
+from app.services.metrics import render_metrics
+from app.services.uart import UART
+
+router = APIRouter()
+
+@router.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+async def metrics():
+    """Métricas del servicio en formato de texto de Prometheus."""
+    # UART es un singleton creado en el lifespan con el puerto real; aquí no se crea
+    return PlainTextResponse(render_metrics(streams.values(), UART._instance),
+                             media_type="text/plain; version=0.0.4")
@@ -1,33 +1,179 @@
-from fastapi import APIRouter
+import asyncio
+import time
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
-import cv2
+from app.services.broadcast import MetadataBroadcaster
 from app.services.camera import Camera
+from app.services.cameras import CameraManager
+from app.services.processing import MAX_TARGETS, targets_to_list
+from app.services.streaming import CameraStreams, FrameEncoder, StreamControl
 
 router = APIRouter(prefix='/detection')
-cam = Camera()
+manager = CameraManager()
 
-def gen_frames(is_mask:bool=False):
-    cap = cv2.VideoCapture(1)  # Ajusta el índice de la cámara si es necesario
-    while True:
-        frame = cam.get_frame() if not is_mask else cam.get_mask()
+streams: Dict[str, CameraStreams] = {
+    cam.cam_id: CameraStreams(cam, FrameEncoder(cam), MetadataBroadcaster(cam)) for cam in manager
+}
 
-        # Codificar el frame en formato JPEG
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
 
-        # Yield del frame como parte del stream
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+def get_streams(cam: Optional[str] = None) -> CameraStreams:
+    """
+    Dependencia de las rutas: `cam` viene de la ruta (`/detection/{cam}/...`)
+    o es opcional (`/detection/...`, primera cámara).
+    """
+    try:
+        return streams[manager.get(cam).cam_id]
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Cámara desconocida: {cam}")
+
+
+async def gen_frames(request: Request, control: StreamControl, cam_streams: CameraStreams):
+    """
+    Envía un frame sólo cuando la cámara publica uno nuevo. No abre ningún
+    dispositivo: todo sale de la caché compartida de `FrameEncoder`.
+    """
+    cam, encoder = cam_streams.cam, cam_streams.encoder
+    last_id = -1
+    last_time = time.perf_counter()
+    encoder.clients += 1
+    try:
+        while True:
+            if await request.is_disconnected():
+                break
+
+            delay = control.delay()
+            if delay:
+                await asyncio.sleep(delay)
+
+            frame_id = await cam.notifier.wait_async(last_id, timeout=1.0)
+            if frame_id == last_id:
+                continue
+
+            if control.frame_width is None and cam.frame is not None:
+                control.frame_width = cam.frame.shape[1]
+
+            # El JPEG se codifica una sola vez por frame y variante, y se comparte entre clientes
+            variant = control.variant()
+            frame = encoder.cached(variant, frame_id)
+            if frame is None:
+                frame_id, frame = await asyncio.to_thread(encoder.get, variant)
+            last_id = frame_id
+            if frame is None:
+                continue
+
+            # Yield del frame como parte del stream
+            now = time.perf_counter()
+            frame_interval, last_time = now - last_time, now
+            chunk = control.chunk(frame)
+            encoder.bytes_sent += len(chunk)
+            yield chunk
+            control.sent(time.perf_counter() - now, frame_interval)
+    finally:
+        encoder.clients -= 1
+
+
+def stream_control(cam: Camera, kind: str, fps, width, quality, adaptive, fmt: str = 'jpeg') -> StreamControl:
+    frame = cam.frame
+    return StreamControl(kind, fps=fps, width=width, quality=quality, adaptive=adaptive,
+                         frame_width=frame.shape[1] if frame is not None else None, fmt=fmt)
 
 
 @router.get("/video", tags=["video"])
-async def video_feed():
-    return StreamingResponse(gen_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+@router.get("/{cam}/video", tags=["video"])
+async def video_feed(
+    request: Request,
+    cam_streams: CameraStreams = Depends(get_streams),
+    fps: Optional[float] = Query(None, gt=0, le=120, description="FPS máximo"),
+    width: Optional[int] = Query(None, ge=32, description="Ancho máximo en píxeles"),
+    quality: Optional[int] = Query(None, ge=5, le=100, description="Calidad JPEG"),
+    adaptive: bool = Query(False, description="Bajar calidad/resolución si el cliente no alcanza"),
+):
+    control = stream_control(cam_streams.cam, 'video', fps, width, quality, adaptive)
+    return StreamingResponse(gen_frames(request, control, cam_streams), media_type="multipart/x-mixed-replace; boundary=frame")
 
 @router.get("/mask", tags=["video"])
-async def video_feed():
-    return StreamingResponse(gen_frames(True), media_type="multipart/x-mixed-replace; boundary=frame")
+@router.get("/{cam}/mask", tags=["video"])
+async def mask_feed(
+    request: Request,
+    cam_streams: CameraStreams = Depends(get_streams),
+    fps: Optional[float] = Query(None, gt=0, le=120, description="FPS máximo"),
+    width: Optional[int] = Query(None, ge=32, description="Ancho máximo en píxeles"),
+    quality: Optional[int] = Query(None, ge=5, le=100, description="Calidad JPEG"),
+    adaptive: bool = Query(False, description="Bajar calidad/resolución si el cliente no alcanza"),
+    format: str = Query('jpeg', pattern='^(jpeg|png)$', description="'png' = PNG de 1 bit sin pérdida"),
+):
+    control = stream_control(cam_streams.cam, 'mask', fps, width, quality, adaptive, format)
+    return StreamingResponse(gen_frames(request, control, cam_streams), media_type="multipart/x-mixed-replace; boundary=frame")
+
+@router.get("/mask-bits", tags=["video"])
+@router.get("/{cam}/mask-bits", tags=["video"])
+async def mask_bits_feed(
+    request: Request,
+    cam_streams: CameraStreams = Depends(get_streams),
+    fps: Optional[float] = Query(None, gt=0, le=120, description="FPS máximo"),
+    width: Optional[int] = Query(None, ge=32, description="Ancho máximo en píxeles"),
+):
+    """Stream binario de máscaras a 1 bit por píxel (ver `app/services/mask_codec.py`)."""
+    control = stream_control(cam_streams.cam, 'mask', fps, width, None, False, 'bits')
+    return StreamingResponse(gen_frames(request, control, cam_streams), media_type="application/octet-stream")
+
+@router.get("/cameras", tags=["control"])
+async def get_cameras():
+    """Ids de las cámaras configuradas (el primero es el de las rutas sin `{cam}`)."""
+    return {'default': manager.default_id, 'cameras': manager.ids()}
 
 @router.get("/metadata", tags=["control"])
-async def get_metadata():
-    return cam.metadata
\ No newline at end of file
+@router.get("/{cam}/metadata", tags=["control"])
+async def get_metadata(
+    cam_streams: CameraStreams = Depends(get_streams),
+    top: int = Query(0, ge=0, le=MAX_TARGETS, description="Incluir las N figuras con más confianza en 'targets'"),
+):
+    metadata, targets, _ = cam_streams.cam.results
+    if top:
+        return {**metadata, 'targets': targets_to_list(targets, top)}
+    return metadata
+
+async def gen_metadata(request: Request, fields: Optional[tuple], top: int, interval: float,
+                       broadcaster: MetadataBroadcaster):
+    """
+    Server-Sent Events con la metadata de cada frame nuevo. Si el cliente pide
+    un ritmo máximo, los registros intermedios se descartan y se envía el último.
+    """
+    queue = broadcaster.subscribe()
+    next_time = 0.
+    try:
+        while True:
+            if await request.is_disconnected():
+                break
+            try:
+                await asyncio.wait_for(queue.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                yield b': keep-alive\n\n'
+                continue
+
+            if interval:
+                wait = next_time - time.perf_counter()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                next_time = time.perf_counter() + interval
+
+            frame_id, data = broadcaster.encode(fields, top)
+            event = f'id: {frame_id}\ndata: {data}\n\n'.encode()
+            broadcaster.bytes_sent += len(event)
+            yield event
+    finally:
+        broadcaster.unsubscribe(queue)
+
+@router.get("/metadata/stream", tags=["control"])
+@router.get("/{cam}/metadata/stream", tags=["control"])
+async def metadata_stream(
+    request: Request,
+    cam_streams: CameraStreams = Depends(get_streams),
+    max_rate: Optional[float] = Query(None, gt=0, le=120, description="Mensajes por segundo como máximo"),
+    fields: Optional[str] = Query(None, description="Campos a enviar separados por coma, p. ej. 'dobj,x_dobj'"),
+    top: int = Query(0, ge=0, le=MAX_TARGETS, description="Incluir las N figuras con más confianza en 'targets'"),
+):
+    selected = tuple(sorted(set(field.strip() for field in fields.split(',') if field.strip()))) if fields else None
+    return StreamingResponse(gen_metadata(request, selected, top, 1. / max_rate if max_rate else 0., cam_streams.broadcaster),
+                             media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -2,9 +2,10 @@ import asyncio
 from fastapi import FastAPI
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
-from app.api.routes import video, control, health
-from app.services.camera import Camera
+from app.api.routes import video, control, health, metrics
+from app.services.cameras import CameraManager
 from app.services.uart import UART
+from app.utils.config import ConfigStore
 
 from contextlib import asynccontextmanager
 import os
@@ -14,8 +15,12 @@ load_dotenv(dotenv_path=".env")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    cam = Camera()
-    cam.start()
+    config = ConfigStore()
+    if config.settings.config_reload:
+        config.start_watching()
+
+    cameras = CameraManager()
+    cameras.start()
 
     port = os.getenv("LINUX-UART-PORT") if os.name == "posix" else os.getenv("WINDOWS-UART-PORT")
     uart = UART(port=port, baud_rate=115200)
@@ -31,8 +36,11 @@ async def lifespan(app: FastAPI):
 
         # Detener los servicios
         try:
+            # Guardar primero los cambios de configuración pendientes
+            config.stop_watching()
+            config.flush()
             uart.stop()
-            cam.stop()
+            cameras.stop()
             print("Servicios detenidos.")
         except Exception as e:
             print(f"Error al detener servicios: {e}")
@@ -46,9 +54,11 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(video.router)
 app.include_router(control.router)
 app.include_router(health.router)
+app.include_router(metrics.router)
 
 # Montar la carpeta estática para servir los archivos HTML, CSS y JS
 app.mount("/static", StaticFiles(directory="../client/home"), name="static")
+app.mount("/calibrate", StaticFiles(directory="../client/calibrate", html=True), name="calibrate")
 
 @app.get("/")
 async def root():
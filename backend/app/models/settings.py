@@ -0,0 +1,61 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel, ConfigDict
+from app.models.shapes import Shape, ShapeType
+
+
+class Settings(BaseModel):
+    """
+    Contenido de `app/config.json`. Las claves desconocidas se conservan tal
+    cual, y al guardar sólo se escriben las claves que ya estaban en el archivo
+    o que se cambiaron.
+    """
+    model_config = ConfigDict(extra='allow')
+
+    cam_idx: int = 0
+    target_shape: str = 'Quadrilateral'
+    focal_lenght: float = 600.
+    kernel_shape: List[int] = [5, 5]
+    lower_hsv: List[int] = [22, 51, 151]
+    upper_hsv: List[int] = [90, 255, 255]
+
+    # Opcionales (ver `Camera.__init__` y `create_source`)
+    source: Optional[dict] = None
+    pipeline: str = 'threaded'
+    workers: int = 2
+    ring_size: int = 2
+    roi_tracking: dict = {}
+    flow_tracking: dict = {}  # `FlowTracker`: enabled, detect_every, max_error, max_scale, win_size, levels
+    tracker: dict = {}  # `TargetTracker`: enabled, detect_every, process_noise, measurement_noise, max_missed, gate
+    pyramid_scale: float = 1.
+    candidate_filter: bool = False
+    profiling: bool = False
+    config_reload: bool = False
+    uart_targets: int = 0  # figuras extra (las de más confianza) que se agregan al mensaje UART
+    uart_max_rate: float = 30.  # mensajes UART por segundo como máximo (0 = sin límite)
+    uart_streaming: bool = False  # enviar sin esperar "RECEIVING DATA"/READY antes de cada mensaje
+
+    # Varias cámaras: cada entrada lleva un `id` y sobrescribe las claves de
+    # arriba para esa cámara, p. ej. [{"id": "izq", "cam_idx": 0}, {"id": "der", "cam_idx": 1}].
+    # Sin esta clave hay una sola cámara con id "0".
+    cameras: List[Dict] = []
+
+    def camera_ids(self) -> List[str]:
+        return [str(entry['id']) for entry in self.cameras] or ['0']
+
+    def camera(self, cam_id: str) -> 'Settings':
+        """Configuración efectiva de una cámara; `KeyError` si el id no existe."""
+        if not self.cameras and cam_id == '0':
+            return self
+        for entry in self.cameras:
+            if str(entry['id']) == cam_id:
+                base = self.model_dump(exclude_unset=True, exclude={'cameras'})
+                overrides = {key: value for key, value in entry.items() if key != 'id'}
+                return Settings.model_validate({**base, **overrides})
+        raise KeyError(cam_id)
+
+    def shape(self) -> Shape:
+        """`target_shape` como figura; acepta 'Circle' o 'circle' (lo que escribe `update-shape`)."""
+        for shape in ShapeType:
+            if str(shape.value).lower() == self.target_shape.lower():
+                return shape.value
+        return ShapeType.QUADRILATERAL.value
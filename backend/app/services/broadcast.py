@@ -0,0 +1,71 @@
+import asyncio
+import json
+import numpy as np
+from typing import Dict, Optional, Set, Tuple
+from app.services.camera import Camera
+from app.services.processing import NO_TARGETS, targets_to_list
+
+
+class MetadataBroadcaster:
+    """
+    Reparte cada nuevo `Camera.metadata` a todos los clientes suscritos.
+
+    Una sola tarea espera la notificación de la cámara y avisa a las colas de
+    los clientes (tamaño 1: si un cliente va lento sólo ve el último registro).
+    El JSON se serializa una vez por frame y por selección de campos y número
+    de figuras (`top`).
+    """
+
+    def __init__(self, cam: Camera):
+        self.cam = cam
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._current: Tuple[int, dict, np.ndarray] = (0, {}, NO_TARGETS)
+        self._encoded: Dict[tuple, str] = {}
+        self.bytes_sent = 0
+
+    @property
+    def clients(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    async def _run(self):
+        last_id = -1
+        while self._subscribers:
+            frame_id = await self.cam.notifier.wait_async(last_id, timeout=1.0)
+            if frame_id == last_id:
+                continue
+            last_id = frame_id
+            metadata, targets, _ = self.cam.results
+            self._current = (frame_id, metadata, targets)
+            self._encoded = {}
+            for queue in list(self._subscribers):
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(frame_id)
+
+    def encode(self, fields: Optional[tuple] = None, top: int = 0) -> Tuple[int, str]:
+        """
+        Retorna `(frame_id, json)` del registro actual con sólo los campos
+        pedidos y, si `top > 0`, las `top` figuras con más confianza en `targets`.
+        """
+        frame_id, metadata, targets = self._current
+        key = (fields, top)
+        encoded = self._encoded.get(key)
+        if encoded is None:
+            if fields is not None:
+                metadata = {key: metadata[key] for key in fields if key in metadata}
+            if top:
+                metadata = {**metadata, 'targets': targets_to_list(targets, top)}
+            encoded = json.dumps(metadata)
+            self._encoded[key] = encoded
+        return frame_id, encoded
@@ -0,0 +1,115 @@
+import asyncio
+from collections import deque
+from threading import Condition
+from typing import Any, Optional
+
+
+class LatestRing:
+    """
+    Buffer circular acotado que comunica dos etapas del pipeline.
+
+    Si el productor va más rápido que el consumidor se descartan los elementos
+    más viejos: el consumidor siempre recibe el más reciente.
+    """
+
+    def __init__(self, size: int = 2):
+        self._items = deque()
+        self._size = max(1, size)
+        self._cond = Condition()
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item: Any):
+        """Agrega un elemento, descartando el más viejo si el buffer está lleno."""
+        with self._cond:
+            if len(self._items) >= self._size:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Espera y retorna el elemento más reciente; los anteriores se descartan.
+        Retorna `None` si vence el `timeout` o si el buffer se cerró.
+        """
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            return item
+
+    def close(self):
+        """Despierta a los consumidores en espera para que terminen."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self._closed = False
+            self._items.clear()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+class FrameNotifier:
+    """
+    Avisa a hilos y a corrutinas de asyncio que hay un frame nuevo publicado.
+
+    Los hilos esperan con `wait` y las corrutinas con `wait_async`; en ambos
+    casos se pasa el último número de frame visto y se retorna el actual.
+    """
+
+    def __init__(self):
+        self._cond = Condition()
+        self._waiters = set()
+        self.seq = 0
+
+    def notify(self, seq: int):
+        with self._cond:
+            self.seq = seq
+            self._cond.notify_all()
+            waiters = list(self._waiters)
+            self._waiters.clear()
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(self._resolve, future, seq)
+            except RuntimeError:
+                pass  # el event loop ya se cerró
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, seq: int):
+        if not future.done():
+            future.set_result(seq)
+
+    def wait(self, last_seq: int, timeout: Optional[float] = None) -> int:
+        """Bloquea el hilo hasta que haya un frame distinto de `last_seq` o venza el `timeout`."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq != last_seq, timeout)
+            return self.seq
+
+    async def wait_async(self, last_seq: int, timeout: Optional[float] = None) -> int:
+        """Igual que `wait` pero sin bloquear el event loop."""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self.seq != last_seq:
+                return self.seq
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.add(waiter)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return self.seq
+        finally:
+            with self._cond:
+                self._waiters.discard(waiter)
@@ -1,32 +1,56 @@
-import cv2
+import time
 import numpy as np
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 from threading import Thread, Lock
+from app.services.buffers import FrameNotifier, LatestRing
+from app.services.profiler import Profiler, SampleRing
+from app.services.processing import (NO_TARGETS, Detection, DetectionParams, FlowTracker, RoiTracker, detect,
+                                     empty_metadata, render, shape_code)
+from app.services.tracking import NO_TRACKS, TargetTracker, track_overlays
+from app.services.workers import DetectionPool
 from app.models.hsv import HSV
-from app.models.shapes import ShapeType, Shape, SelectShapes
-from app.utils.helpers import get_json_settings, set_json_settings
+from app.models.shapes import Shape
+from app.utils.config import ConfigStore
+from app.services.sources import FrameSource, DeviceSource, create_source
 
 
 class Camera:
-    _instance = None  # Variable de clase para el patrón Singleton
+    """
+    Pipeline de captura y detección de una cámara.
+
+    Hay una instancia por id de cámara (ver `cameras` en `Settings`);
+    `Camera()` sin id retorna la primera, así que el código pensado para una
+    sola cámara sigue funcionando igual.
+    """
+
+    _instances: Dict[str, 'Camera'] = {}  # Una instancia por id de cámara
     _lock = Lock()  # Lock para evitar problemas de concurrencia
 
-    def __new__(cls, *args, **kwargs):
-        """Singleton: Asegura que solo haya una instancia de la clase."""
+    def __new__(cls, cam_id: Optional[str] = None, *args, **kwargs):
+        """Singleton por id: Asegura que solo haya una instancia por cámara."""
+        settings = ConfigStore().settings
+        cam_id = settings.camera_ids()[0] if cam_id is None else str(cam_id)
+        settings.camera(cam_id)  # KeyError si la cámara no está configurada
         with cls._lock:
-            if cls._instance is None:
-                cls._instance = super().__new__(cls)
-        return cls._instance
+            if cam_id not in cls._instances:
+                cls._instances[cam_id] = super().__new__(cls)
+        return cls._instances[cam_id]
 
-    def __init__(self):
+    def __init__(self, cam_id: Optional[str] = None):
         if not hasattr(self, "_initialized"):
-            config = get_json_settings()
+            settings = ConfigStore().settings
+            self.cam_id = settings.camera_ids()[0] if cam_id is None else str(cam_id)
+            config = settings.camera(self.cam_id)
 
             # Inicializa la cámara y las variables
-            self.camera_index = config['cam_idx']
-            self.cap = cv2.VideoCapture(self.camera_index)
-            self.frame = None
+            self.camera_index = config.cam_idx
+            self.cap: FrameSource = create_source(config.model_dump())
+            self.frame = None  # último frame sin anotaciones
             self.mask = None
+            self.overlays = []
+            self._latest = (0, None, [])  # (frame_id, frame, overlays) publicados juntos
+            self._annotated = (None, None)  # (frame_id, frame anotado)
+            self.notifier = FrameNotifier()  # avisa a los streams cuando hay un frame nuevo
             self.metadata = {
                 "x_dobj": 0,
                 "y_dobj": 0,
@@ -34,49 +58,136 @@ class Camera:
                 "dobj": 0,
                 "area": 0
             }
+            # Todas las figuras del último frame (arreglo `TARGET_DTYPE`, ordenado por confianza)
+            self.targets = NO_TARGETS
+            self.stamp = 0.  # instante de captura (`time.perf_counter`) del frame publicado
+            self.results = (self.metadata, self.targets, self.stamp)  # publicados juntos
             self.running = False
+            self.threads: List[Thread] = []
+
+            # Pipeline: 'serial' (un solo hilo), 'threaded' (captura, detección y publicación en paralelo)
+            # o 'processes' (detección en `workers` procesos sobre memoria compartida)
+            self.pipeline = config.pipeline
+            self.pool = DetectionPool(config.workers, self._on_pool_result)
+            self.frame_ring = LatestRing(config.ring_size)
+            self.result_ring = LatestRing(config.ring_size)
+            self.frame_id = 0
+            self.captured_count = 0
+            self.processed_count = 0
+            self.hit_count = 0  # frames publicados con el objetivo encontrado
+            self.predicted_count = 0  # frames publicados sólo con la predicción del tracker
+            self.publish_times = SampleRing(256)  # para los FPS de esta cámara
+
+            # Seguimiento por ROI: busca sólo alrededor de la última detección (no aplica a 'processes')
+            roi_config = dict(config.roi_tracking)
+            self.tracking = roi_config.pop('enabled', False)
+            self.roi_tracker = RoiTracker(**roi_config)
+
+            # Detección completa cada `detect_every` frames y flujo óptico entre ellas (no aplica a 'processes')
+            flow_config = dict(config.flow_tracking)
+            self.flow = flow_config.pop('enabled', False)
+            self.flow_tracker = FlowTracker(**flow_config)
+
+            # Filtro de Kalman por figura: suaviza la posición, publica la velocidad y
+            # predice durante pérdidas cortas. Con `detect_every` > 1 la detección corre
+            # uno de cada N frames y el resto se publica con la predicción (no aplica a 'processes')
+            tracker_config = dict(config.tracker)
+            self.track_targets = tracker_config.pop('enabled', False)
+            self.detect_every = max(1, int(tracker_config.pop('detect_every', 1)))
+            self.target_tracker = TargetTracker(**tracker_config)
+            self.tracks = NO_TRACKS  # arreglo `TRACK_DTYPE` del último frame publicado
+            self._detect_turn = 0
+
+            # Detección gruesa a fina: 1 (desactivada), 0.5 o 0.25
+            self.pyramid_scale = config.pyramid_scale
+
+            # Filtra manchas por área, aspecto y llenado antes de aproximar polígonos
+            self.candidate_filter = config.candidate_filter
+
+            # Tiempos por etapa de esta cámara (se puede cambiar en ejecución con `set_profiling`)
+            self.profiler = Profiler(enabled=config.profiling)
 
             # Valores HSV predeterminados
             self.hsv = HSV(
-                lower_hsv = np.array(config['lower_hsv']),
-                upper_hsv = np.array(config['upper_hsv'])
+                lower_hsv = np.array(config.lower_hsv),
+                upper_hsv = np.array(config.upper_hsv)
             )
 
             # Kernel para operaciones morfológicas
-            self.kernel = np.ones(config['kernel_shape'], np.uint8)
+            self.kernel = np.ones(config.kernel_shape, np.uint8)
 
             # Para asegurarnos de no re-inicializar
             self._initialized = True
 
-            self.focal_lenght = config['focal_lenght'] # cm, ecuation (width * REAL_DISTANCE) / REAL_WIDTH
-            if config['target_shape'] == SelectShapes.QUADRILATERAL:
-                self.target_shape: Shape = ShapeType.QUADRILATERAL.value
-            elif config['target_shape'] == SelectShapes.TRIANGLE:
-                self.target_shape: Shape = ShapeType.TRIANGLE.value
-            elif config['target_shape'] == SelectShapes.CIRCLE:
-                self.target_shape: Shape = ShapeType.CIRCLE.value
-            else: self.target_shape = ShapeType.QUADRILATERAL.value
+            self.focal_lenght = config.focal_lenght # cm, ecuation (width * REAL_DISTANCE) / REAL_WIDTH
+            self.target_shape: Shape = config.shape()
 
     def start(self):
-        """Inicia el hilo para capturar frames de la cámara."""
+        """Inicia los hilos para capturar y procesar frames de la cámara."""
         if not self.running:
             self.running = True
-            self.thread = Thread(target=self._loop, daemon=True)
-            self.thread.start()
+            if self.pipeline == 'serial':
+                targets = [self._loop]
+            else:
+                self.frame_ring.reopen()
+                self.result_ring.reopen()
+                detection = self._dispatch_loop if self.pipeline == 'processes' else self._detection_loop
+                targets = [self._capture_loop, detection, self._publish_loop]
+            self.threads = [Thread(target=target, daemon=True) for target in targets]
+            for thread in self.threads:
+                thread.start()
 
     def stop(self):
         """Detiene la captura de la cámara."""
-        self.running = False
         if self.running:
             self.running = False
-            if self.thread and self.thread.is_alive():
-                self.thread.join()
+            self.frame_ring.close()
+            self.result_ring.close()
+            for thread in self.threads:
+                if thread.is_alive():
+                    thread.join()
+            self.pool.stop()
         self.cap.release()
-        print('Camera serivice stoped')
-
-    def get_frame(self):
-        """Obtiene el último frame capturado."""
-        return self.frame
+        print(f'Camera {self.cam_id} serivice stoped')
+
+    def get_stats(self) -> Dict[str, int]:
+        """Contadores del pipeline, útiles para medir frames descartados."""
+        return {
+            'frame_id': self.frame_id,
+            'captured': self.captured_count,
+            'processed': self.processed_count,
+            'hits': self.hit_count,
+            'predicted': self.predicted_count,
+            'flow_tracked': self.flow_tracker.flow_count,
+            'flow_fallbacks': self.flow_tracker.fallbacks,
+            'dropped_capture': self.frame_ring.dropped,
+            'dropped_publish': self.result_ring.dropped,
+            'dropped_workers': self.pool.dropped,
+            'lost_workers': self.pool.lost,
+            'worker_restarts': self.pool.restarts,
+        }
+
+    def fps(self) -> float:
+        """Frames publicados por segundo en las últimas muestras."""
+        return self.publish_times.rate()
+
+    def get_frame(self, annotated: bool = True):
+        """
+        Obtiene el último frame capturado. Las anotaciones se dibujan aquí, sólo
+        cuando alguien pide el frame, y una sola vez por frame.
+        """
+        if not annotated:
+            return self.frame
+        frame_id, frame, overlays = self._latest
+        cached_id, annotated_frame = self._annotated
+        if cached_id != frame_id:
+            if frame is None:
+                return None
+            t = self.profiler.start()
+            annotated_frame = render(frame, overlays)
+            self.profiler.stop('render', t)
+            self._annotated = (frame_id, annotated_frame)
+        return annotated_frame
 
     def get_mask(self):
         """Obtiene el último frame capturado."""
@@ -98,7 +209,30 @@ class Camera:
 
     def set_camera(self, camera_index: int):
         self.camera_index = camera_index
-        self.cap = cv2.VideoCapture(camera_index)
+        self.set_source(DeviceSource(camera_index))
+
+    def set_source(self, source: FrameSource):
+        """Reemplaza la fuente de frames (cámara, video, imágenes o frames sintéticos)."""
+        old = self.cap
+        self.cap = source
+        if old is not None and old is not source:
+            old.release()
+
+    def set_tracking(self, enabled: bool):
+        """Activa o desactiva la búsqueda por ROI."""
+        self.roi_tracker.reset()
+        self.tracking = enabled
+
+    def set_flow_tracking(self, enabled: bool):
+        """Activa o desactiva el seguimiento por flujo óptico entre detecciones completas."""
+        self.flow_tracker.reset()
+        self.flow = enabled
+
+    def set_profiling(self, enabled: bool):
+        """Activa o desactiva los tiempos por etapa; al activarlos se descartan los anteriores."""
+        if enabled and not self.profiler.enabled:
+            self.profiler.reset()
+        self.profiler.enabled = enabled
 
     def custom_set_hsv(self, values:Dict[str, int]):
         """
@@ -130,98 +264,131 @@ class Camera:
         if values.get('uv') is not None:
             self.hsv.upper_hsv[2] = values.get('uv')
 
+    def detection_params(self) -> DetectionParams:
+        """Toma una instantánea de los parámetros de detección actuales."""
+        return DetectionParams(
+            lower_hsv=np.array(self.hsv.lower_hsv),
+            upper_hsv=np.array(self.hsv.upper_hsv),
+            kernel=self.kernel,
+            target_shape=self.target_shape,
+            focal_lenght=self.focal_lenght,
+            pyramid_scale=self.pyramid_scale,
+            candidate_filter=self.candidate_filter,
+        )
+
+    def _process(self, frame):
+        """Procesa un frame y retorna `(frame, detection)`; `detection` es `None` si toca sólo predecir."""
+        if self.track_targets and self.detect_every > 1:
+            self._detect_turn += 1
+            if self._detect_turn % self.detect_every:
+                return frame, None
+        if self.flow:
+            full = self.roi_tracker.detect if self.tracking else detect
+            detection = self.flow_tracker.detect(frame, self.detection_params(), full)
+        elif self.tracking:
+            detection = self.roi_tracker.detect(frame, self.detection_params())
+        else:
+            detection = detect(frame, self.detection_params())
+        self.processed_count += 1
+        return frame, detection
+
+    def _publish(self, frame, detection: Optional[Detection], stamp: float):
+        """Actualizar el frame y los metadatos; `stamp` es el instante de captura del frame."""
+        if detection is None:
+            # Frame sin detección (`detect_every`): se publica la predicción del tracker
+            self.tracks = self.target_tracker.predict(stamp)
+            metadata = self.target_tracker.metadata(empty_metadata())
+            overlays = track_overlays(self.tracks, frame.shape, self.focal_lenght)
+            targets = NO_TARGETS
+            self.predicted_count += 1
+        else:
+            self.mask = detection.mask
+            metadata, overlays, targets = detection.metadata, detection.overlays, detection.targets
+            if self.track_targets:
+                self.tracks = self.target_tracker.update(targets, stamp, shape_code(self.target_shape))
+                metadata = self.target_tracker.metadata(metadata)
+                overlays = overlays + track_overlays(self.tracks, frame.shape, self.focal_lenght, only_missed=True)
+            if detection.hit is not None:
+                self.hit_count += 1
+
+        self.frame = frame
+        self.overlays = overlays
+        self.metadata = metadata
+        self.targets = targets
+        self.stamp = stamp
+        self.results = (metadata, targets, stamp)
+        self.frame_id += 1
+        self._latest = (self.frame_id, frame, overlays)
+        self.profiler.tick()
+        self.publish_times.add(time.perf_counter())
+        self.notifier.notify(self.frame_id)
+
     def _loop(self):
-        """Captura y procesa frames en segundo plano."""
+        """Captura y procesa frames en segundo plano (un solo hilo)."""
+        self.profiler.bind()
         while self.running:
+            t = self.profiler.start()
             ret, frame = self.cap.read()
             if not ret:
                 break
+            stamp = time.perf_counter()
+            self.profiler.stop('capture', t)
+            self.captured_count += 1
+            self._publish(*self._process(frame), stamp)
 
-            # Convertir a HSV y aplicar la máscara
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-            mask = cv2.inRange(hsv, np.array(self.hsv.lower_hsv), np.array(self.hsv.upper_hsv))
-            mask = cv2.erode(mask, self.kernel)
-            
-            # declaracion de variables de medicion
-            distance = .0
-            area = .0
-            x_dobj = .0
-            y_dobj = .0
-            z_dobj = .0
-
-            # Obtener contornos
-            contours = self._get_contours(mask)
-            for cnt in contours:
-                area = cv2.contourArea(cnt)
-                
-                if area > 400:
-                    approx = cv2.approxPolyDP(cnt, 0.02 * cv2.arcLength(cnt, True), True)
-                    if len(approx) >= 3 and len(contours) <= 20:
-                        distance = self._shape_detection(approx, area, frame)
-                        x_dobj, y_dobj, z_dobj = self._calculate_xy_distance(frame.shape, distance, cnt, frame)
-
-            # Actualizar el frame y los metadatos
-            self.frame = frame
-            self.mask = mask
-            self.metadata = {
-                'x_dobj': x_dobj,
-                'y_dobj': y_dobj,
-                'z_dobj': z_dobj,
-                'dobj': distance,
-                'area': area,
-            }
-
-    def _shape_detection(self, approx, area, frame):
-        x = approx.ravel()[0]
-        y = approx.ravel()[1]
-        distance = 0
-
-        
-
-        if self.target_shape.eval_sides(len(approx)):
-            cv2.drawContours(frame, [approx], 0, (0, 255, 0), 5)
-            distance = np.sqrt((self.target_shape.AREA * self.focal_lenght**2) / area)
-            cv2.putText(frame, f"{self.target_shape}:{distance}", (0, 25), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-        return distance
-        
-    def _calculate_xy_distance(self, img_size, distance, cnt, frame):
-        """
-        Esta funcion a partir de la distancia debe descomoner esa distancia en coordenadas x y
-        """
-        width = img_size[1]
-        heigth = img_size[0]
-
-        x_dobj = 0.
-        y_dobj = 0.
-        z_dobj = distance
-
-        M = cv2.moments(cnt)
-        if M["m00"] != 0:  # Evita división por cero
-            x_obj = int(M["m10"] / M["m00"])
-            y_obj = int(M["m01"] / M["m00"])
-        else:
-            x_obj, y_obj = 0, 0
-
-        x_relative = x_obj - width / 2
-        y_relative = heigth / 2 - y_obj  # Invertir eje Y
-
-
-        factor = (z_dobj / self.focal_lenght)
-        x_dobj = x_relative * factor
-        y_dobj = y_relative * factor
-
-
-        cv2.circle(frame, (int(x_obj), int(y_obj)), 5, (0, 0, 255), -1)
-        cv2.circle(frame, (width // 2, heigth // 2), 5, (0, 255, 0), -1)
-
-        return (x_dobj, y_dobj, z_dobj)
-
-    def _get_contours(self, mask):
-        """Obtiene los contornos de la máscara."""
-        if int(cv2.__version__[0]) > 3:
-            contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        else:
-            _, contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        return contours
-    
+    def _capture_loop(self):
+        """Etapa de captura: lee frames lo más rápido posible y los deja en el buffer."""
+        while self.running:
+            t = self.profiler.start()
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            stamp = time.perf_counter()
+            self.profiler.stop('capture', t)
+            self.captured_count += 1
+            self.frame_ring.put((frame, stamp))
+        self.frame_ring.close()
+
+    def _detection_loop(self):
+        """Etapa de detección: siempre trabaja sobre el frame más reciente."""
+        self.profiler.bind()
+        while self.running:
+            item = self.frame_ring.get(timeout=0.5)
+            if item is None:
+                if self.frame_ring.closed:
+                    break
+                continue
+            frame, stamp = item
+            self.result_ring.put((*self._process(frame), stamp))
+        self.result_ring.close()
+
+    def _dispatch_loop(self):
+        """Etapa de detección en procesos: reparte el frame más reciente entre los workers."""
+        self.profiler.bind()
+        while self.running:
+            item = self.frame_ring.get(timeout=0.5)
+            if item is None:
+                if self.frame_ring.closed:
+                    break
+                continue
+            frame, stamp = item
+            if self.pool.failed:
+                # Los workers siguen muriendo: se detecta en este hilo como el pipeline 'threaded'
+                self.result_ring.put((*self._process(frame), stamp))
+                continue
+            self.pool.submit(frame, self.detection_params(), stamp)
+
+    def _on_pool_result(self, frame, detection: Detection, stamp: float):
+        """Recibe los resultados de los workers ya ordenados por frame."""
+        self.processed_count += 1
+        self.result_ring.put((frame, detection, stamp))
+
+    def _publish_loop(self):
+        """Etapa de publicación: expone el último resultado a las rutas y al UART."""
+        while self.running:
+            result = self.result_ring.get(timeout=0.5)
+            if result is None:
+                if self.result_ring.closed:
+                    break
+                continue
+            self._publish(*result)
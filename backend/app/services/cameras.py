@@ -0,0 +1,50 @@
+from threading import Lock
+from typing import Dict, Iterator, List, Optional
+from app.services.camera import Camera
+from app.utils.config import ConfigStore
+
+
+class CameraManager:
+    """
+    Todas las cámaras configuradas, cada una con su propio pipeline de
+    captura y detección (hilos o procesos) y sus propios HSV, figura y
+    distancia focal. Las cámaras corren en paralelo sin compartir estado.
+    """
+
+    _instance = None  # Variable de clase para el patrón Singleton
+    _lock = Lock()  # Lock para evitar problemas de concurrencia
+
+    def __new__(cls, *args, **kwargs):
+        """Singleton: Asegura que solo haya una instancia de la clase."""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, "_initialized"):
+            ids = ConfigStore().settings.camera_ids()
+            self.default_id = ids[0]
+            self.cameras: Dict[str, Camera] = {cam_id: Camera(cam_id) for cam_id in ids}
+            self._initialized = True
+
+    def get(self, cam_id: Optional[str] = None) -> Camera:
+        """Cámara por id (`None` = la primera); `KeyError` si no existe."""
+        return self.cameras[self.default_id if cam_id is None else str(cam_id)]
+
+    def ids(self) -> List[str]:
+        return list(self.cameras)
+
+    def __iter__(self) -> Iterator[Camera]:
+        return iter(self.cameras.values())
+
+    def start(self):
+        for cam in self:
+            cam.start()
+
+    def stop(self):
+        for cam in self:
+            try:
+                cam.stop()
+            except Exception as e:
+                print(f"Error al detener la cámara {cam.cam_id}: {e}")
@@ -0,0 +1,43 @@
+import struct
+import zlib
+import cv2
+import numpy as np
+
+# Cabecera de cada máscara en el stream binario:
+# magic (2s) | versión (B) | formato (B) | ancho (H) | alto (H) | largo del payload (I)
+HEADER = struct.Struct('<2sBBHHI')
+MAGIC = b'MK'
+VERSION = 1
+
+# Formatos del payload
+FORMAT_BITS = 1  # 1 bit por píxel (np.packbits, MSB primero) comprimido con zlib
+FORMAT_PNG = 2   # PNG de 1 bit con compresión baja
+
+
+def encode_mask(mask: np.ndarray, fmt: str = 'bits') -> bytes:
+    """Codifica la máscara binaria sin pérdida; retorna sólo el payload."""
+    if fmt == 'bits':
+        return zlib.compress(np.packbits(mask > 0).tobytes(), 1)
+    if fmt == 'png':
+        ret, buffer = cv2.imencode('.png', mask, [cv2.IMWRITE_PNG_COMPRESSION, 1, cv2.IMWRITE_PNG_BILEVEL, 1])
+        if not ret:
+            raise ValueError("No se pudo codificar la máscara en PNG")
+        return buffer.tobytes()
+    raise ValueError(f"Formato de máscara desconocido: {fmt}")
+
+
+def pack_mask(mask: np.ndarray) -> bytes:
+    """Máscara con cabecera, lista para el stream `/detection/mask-bits`."""
+    payload = encode_mask(mask, 'bits')
+    height, width = mask.shape[:2]
+    return HEADER.pack(MAGIC, VERSION, FORMAT_BITS, width, height, len(payload)) + payload
+
+
+def unpack_mask(data: bytes) -> np.ndarray:
+    """Inverso de `pack_mask` (lo mismo que hace `client/calibrate/app.js`)."""
+    magic, version, fmt, width, height, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or fmt != FORMAT_BITS:
+        raise ValueError("Cabecera de máscara inválida")
+    payload = data[HEADER.size:HEADER.size + length]
+    bits = np.frombuffer(zlib.decompress(payload), np.uint8)
+    return (np.unpackbits(bits, count=width * height).reshape(height, width) * 255).astype(np.uint8)
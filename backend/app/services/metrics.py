@@ -0,0 +1,94 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.services.streaming import CameraStreams
+
+PREFIX = 'geodetector_'
+
+
+class MetricsWriter:
+    """
+    Arma el texto en formato de exposición de Prometheus (versión 0.0.4).
+    Las muestras de una misma métrica se agrupan bajo un solo HELP/TYPE.
+    """
+
+    def __init__(self):
+        self.families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+    def add(self, name: str, kind: str, help: str, value, labels: Optional[dict] = None):
+        name = PREFIX + name
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = (kind, help, [])
+        sample = name
+        if labels:
+            sample += '{' + ','.join(f'{key}="{val}"' for key, val in labels.items()) + '}'
+        family[2].append(f'{sample} {float(value)!r}' if isinstance(value, float) else f'{sample} {int(value)}')
+
+    def text(self) -> str:
+        lines = []
+        for name, (kind, help, samples) in self.families.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+def render_metrics(streams: Iterable[CameraStreams], uart=None) -> str:
+    """
+    Lee los contadores de cada servicio sin tomar ningún lock: son enteros que
+    sólo incrementa su hilo dueño, así que el scrape no frena la captura.
+    Las métricas de cámara y de streams llevan la etiqueta `cam`.
+    """
+    out = MetricsWriter()
+    streams = list(streams)
+
+    for cam, _, _ in streams:
+        labels = {'cam': cam.cam_id}
+        stats = cam.get_stats()
+        out.add('camera_fps', 'gauge', 'Frames publicados por segundo.', cam.fps(), labels)
+        out.add('frames_captured_total', 'counter', 'Frames leídos de la fuente.', stats['captured'], labels)
+        out.add('frames_processed_total', 'counter', 'Frames procesados por la detección.', stats['processed'], labels)
+        out.add('frames_published_total', 'counter', 'Frames publicados a las rutas y al UART.', stats['frame_id'], labels)
+        for stage in ('capture', 'publish', 'workers'):
+            out.add('frames_dropped_total', 'counter', 'Frames descartados por etapa.',
+                    stats[f'dropped_{stage}'], {**labels, 'stage': stage})
+        out.add('frames_lost_total', 'counter', 'Frames perdidos porque su worker de detección murió.',
+                stats['lost_workers'], labels)
+        out.add('worker_restarts_total', 'counter', 'Workers de detección reiniciados tras morir.',
+                stats['worker_restarts'], labels)
+        out.add('frames_predicted_total', 'counter', 'Frames publicados sólo con la predicción del tracker.',
+                stats['predicted'], labels)
+        out.add('frames_flow_tracked_total', 'counter', 'Frames resueltos con flujo óptico sin detección completa.',
+                stats['flow_tracked'], labels)
+        out.add('flow_fallbacks_total', 'counter', 'Veces que el flujo óptico falló y se volvió a la detección completa.',
+                stats['flow_fallbacks'], labels)
+        out.add('detection_hits_total', 'counter', 'Frames publicados con el objetivo encontrado.', stats['hits'], labels)
+        out.add('detection_hit_ratio', 'gauge', 'Proporción de frames publicados con el objetivo encontrado.',
+                stats['hits'] / stats['frame_id'] if stats['frame_id'] else 0., labels)
+
+    for cam, encoder, broadcaster in streams:
+        labels = {'cam': cam.cam_id}
+        out.add('stream_clients', 'gauge', 'Clientes conectados por stream.', encoder.clients,
+                {**labels, 'stream': 'mjpeg'})
+        out.add('stream_clients', 'gauge', 'Clientes conectados por stream.', broadcaster.clients,
+                {**labels, 'stream': 'metadata'})
+        out.add('stream_bytes_total', 'counter', 'Bytes enviados por stream.', encoder.bytes_sent,
+                {**labels, 'stream': 'mjpeg'})
+        out.add('stream_bytes_total', 'counter', 'Bytes enviados por stream.', broadcaster.bytes_sent,
+                {**labels, 'stream': 'metadata'})
+        out.add('frame_encode_seconds_total', 'counter', 'Tiempo total codificando frames (JPEG/PNG/bits).',
+                encoder.encode_seconds, labels)
+        out.add('frame_encode_total', 'counter', 'Frames codificados.', encoder.encode_count, labels)
+
+    if uart is not None:
+        out.add('uart_tx_total', 'counter', 'Mensajes enviados por UART.', uart.tx_count)
+        out.add('uart_tx_bytes_total', 'counter', 'Bytes enviados por UART.', uart.tx_bytes)
+        out.add('uart_tx_errors_total', 'counter', 'Errores al enviar por UART.', uart.tx_errors)
+        out.add('uart_tx_dropped_total', 'counter', 'Resultados no enviados por UART porque llegó uno más nuevo.',
+                uart.tx_dropped)
+        out.add('uart_rx_total', 'counter', 'Mensajes recibidos por UART.', uart.rx_count)
+        out.add('uart_rx_errors_total', 'counter', 'Errores al recibir por UART.', uart.rx_errors)
+        out.add('uart_protocol_version', 'gauge', 'Versión del protocolo UART negociada (0 = texto).', uart.version)
+        out.add('uart_up', 'gauge', '1 si el puerto UART está abierto.',
+                int(uart.serial_port is not None and uart.serial_port.is_open))
+
+    return out.text()
@@ -0,0 +1,530 @@
+import time
+import cv2
+import numpy as np
+from typing import List, NamedTuple, Optional, Tuple
+from app.models.shapes import Circle, Shape, ShapeType
+from app.services.profiler import current_profiler
+
+# Área mínima (px) que debe tener un contorno a resolución completa
+MIN_AREA = 400
+
+# Filtros de la etapa de candidatos (`candidate_filter`)
+MAX_ASPECT = 4.
+MIN_FILL = 0.3
+
+
+class DetectionParams(NamedTuple):
+    """Parámetros de detección que se leen una sola vez por frame."""
+    lower_hsv: np.ndarray
+    upper_hsv: np.ndarray
+    kernel: np.ndarray
+    target_shape: Shape
+    focal_lenght: float
+    pyramid_scale: float = 1.
+    candidate_filter: bool = False
+
+
+# Primitiva de dibujo: ('contour', puntos, color) | ('text', texto, origen, color) | ('circle', centro, color)
+Overlay = tuple
+
+
+# Figuras reconocidas y su código en `targets['shape']` (0 = ninguna)
+SHAPE_CODES = {
+    1: ShapeType.QUADRILATERAL.value,
+    2: ShapeType.TRIANGLE.value,
+    3: ShapeType.CIRCLE.value,
+}
+MAX_TARGETS = 20
+
+# Una fila por figura encontrada: código, confianza (0..1), área (px), centroide (px),
+# posición 3D (cm, como `position`) y rectángulo (px)
+TARGET_DTYPE = np.dtype([
+    ('shape', 'u1'), ('confidence', 'f4'), ('area', 'f4'), ('cx', 'f4'), ('cy', 'f4'),
+    ('x', 'f4'), ('y', 'f4'), ('z', 'f4'), ('bx', 'i4'), ('by', 'i4'), ('bw', 'i4'), ('bh', 'i4'),
+])
+NO_TARGETS = np.empty(0, TARGET_DTYPE)
+
+
+class Detection(NamedTuple):
+    """Resultado de procesar un frame; el dibujo se hace después, sólo si alguien lo pide."""
+    mask: np.ndarray
+    metadata: dict
+    overlays: List[Overlay]
+    hit: Optional[Tuple[int, int, int, int]] = None
+    targets: np.ndarray = NO_TARGETS
+    polygon: Optional[np.ndarray] = None  # vértices (`approxPolyDP`) del objetivo de `hit`
+
+
+def empty_metadata() -> dict:
+    return {
+        'x_dobj': .0,
+        'y_dobj': .0,
+        'z_dobj': .0,
+        'dobj': .0,
+        'area': .0,
+    }
+
+
+def detect(frame: np.ndarray, params: DetectionParams) -> Detection:
+    """
+    Aplica la máscara HSV y busca el objetivo. `frame` no se modifica: las
+    anotaciones se devuelven como primitivas para dibujarlas con `render`.
+    """
+    if params.pyramid_scale < 1:
+        return detect_pyramid(frame, params)
+    return detect_region(frame, params)
+
+
+def render(frame: np.ndarray, overlays: List[Overlay]) -> np.ndarray:
+    """Dibuja las primitivas sobre una copia del frame."""
+    annotated = frame.copy()
+    for overlay in overlays:
+        kind = overlay[0]
+        if kind == 'contour':
+            cv2.drawContours(annotated, [overlay[1]], 0, overlay[2], 5)
+        elif kind == 'text':
+            cv2.putText(annotated, overlay[1], overlay[2], cv2.FONT_HERSHEY_SIMPLEX, 1, overlay[3], 2)
+        elif kind == 'circle':
+            cv2.circle(annotated, overlay[1], 5, overlay[2], -1)
+    return annotated
+
+
+def build_mask(region: np.ndarray, params: DetectionParams, kernel: Optional[np.ndarray] = None) -> np.ndarray:
+    """Convierte a HSV, aplica el rango y erosiona."""
+    profiler = current_profiler()
+    t = profiler.start()
+    hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
+    t = profiler.stop('color', t)
+    mask = cv2.inRange(hsv, params.lower_hsv, params.upper_hsv)
+    t = profiler.stop('mask', t)
+    mask = cv2.erode(mask, params.kernel if kernel is None else kernel)
+    profiler.stop('erode', t)
+    return mask
+
+
+def detect_region(frame: np.ndarray, params: DetectionParams,
+                  roi: Optional[Tuple[int, int, int, int]] = None) -> Detection:
+    """
+    Igual que `detect` pero limitando la búsqueda a `roi` (x, y, w, h).
+
+    Los contornos se desplazan a coordenadas del frame completo, así que la
+    distancia y el XY no cambian respecto a la búsqueda completa.
+    """
+    if roi is None:
+        x0, y0, region = 0, 0, frame
+    else:
+        x0, y0, w, h = roi
+        region = frame[y0:y0 + h, x0:x0 + w]
+
+    # Convertir a HSV y aplicar la máscara
+    region_mask = build_mask(region, params)
+
+    if roi is None:
+        mask = region_mask
+    else:
+        mask = np.zeros(frame.shape[:2], np.uint8)
+        mask[y0:y0 + region_mask.shape[0], x0:x0 + region_mask.shape[1]] = region_mask
+
+    return measure(frame.shape, mask, find_contours(region_mask, params, (x0, y0)), params)
+
+
+def detect_pyramid(frame: np.ndarray, params: DetectionParams) -> Detection:
+    """
+    Detección gruesa a fina: la máscara y los candidatos se calculan sobre el
+    frame reducido por `params.pyramid_scale` y sólo los rectángulos candidatos
+    se vuelven a segmentar a resolución completa, de modo que el área y los
+    momentos usados para la distancia son los de resolución completa.
+    """
+    scale = params.pyramid_scale
+    height, width = frame.shape[:2]
+    small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+    # El kernel y el umbral de área se escalan junto con el frame
+    kh, kw = params.kernel.shape[:2]
+    small_kernel = np.ones((max(1, round(kh * scale)), max(1, round(kw * scale))), np.uint8)
+    small_mask = build_mask(small, params, small_kernel)
+    min_area = MIN_AREA * scale * scale
+
+    candidates = get_contours(small_mask, mode=cv2.RETR_EXTERNAL)
+
+    # Refinar cada candidato a resolución completa
+    pad = int(np.ceil(2 / scale)) + max(kh, kw)
+    contours = []
+    for cnt in candidates:
+        if cv2.contourArea(cnt) <= min_area:
+            continue
+        x, y, w, h = cv2.boundingRect(cnt)
+        x0 = max(int(x / scale) - pad, 0)
+        y0 = max(int(y / scale) - pad, 0)
+        x1 = min(int((x + w) / scale) + pad, width)
+        y1 = min(int((y + h) / scale) + pad, height)
+        contours.extend(find_contours(build_mask(frame[y0:y1, x0:x1], params), params, (x0, y0)))
+
+    mask = cv2.resize(small_mask, (width, height), interpolation=cv2.INTER_NEAREST)
+    return measure(frame.shape, mask, contours, params)
+
+
+def measure(img_size, mask: np.ndarray, contours, params: DetectionParams) -> Detection:
+    """
+    Evalúa los contornos y calcula la posición de cada figura encontrada.
+
+    `targets` tiene una fila por figura reconocida (cualquiera de las tres),
+    ordenadas por confianza. `metadata` y `hit` (rectángulo, o `None`) son los
+    de la mejor figura del tipo `params.target_shape`.
+    """
+    # declaracion de variables de medicion
+    distance = .0
+    area = .0
+    x_dobj = .0
+    y_dobj = .0
+    z_dobj = .0
+    hit = None
+    polygon = None
+    overlays: List[Overlay] = []
+    if params.candidate_filter:
+        # Los candidatos vienen filtrados y ordenados por área: se evalúan los primeros
+        contours = contours[:MAX_TARGETS]
+    elif len(contours) > 20:
+        contours = []
+    targets = np.empty(min(len(contours), MAX_TARGETS), TARGET_DTYPE)
+    count = 0
+    best = -1.
+    target_code = shape_code(params.target_shape)
+
+    # 'shape' es todo el recorrido de contornos menos el cálculo de 'distance'
+    profiler = current_profiler()
+    start = profiler.start()
+    distance_time = None
+
+    for cnt in contours:
+        cnt_area = cv2.contourArea(cnt)
+        if cnt_area <= MIN_AREA or count >= len(targets):
+            continue
+
+        perimeter = cv2.arcLength(cnt, True)
+        approx = cv2.approxPolyDP(cnt, 0.02 * perimeter, True)
+        code = classify(len(approx))
+        if not code:
+            continue
+
+        shape = SHAPE_CODES[code]
+        cnt_distance = np.sqrt((shape.AREA * params.focal_lenght**2) / cnt_area)
+        t = profiler.start()
+        x, y, z, center = position(img_size, cnt_distance, cnt, params)
+        if t:
+            distance_time = (distance_time or 0.) + time.perf_counter() - t
+        confidence = shape_confidence(shape, approx, cnt_area, perimeter)
+        bbox = cv2.boundingRect(cnt)
+        targets[count] = (code, confidence, cnt_area, center[0], center[1], x, y, z, *bbox)
+        count += 1
+
+        is_target = code == target_code
+        overlays.append(('contour', approx, (0, 255, 0) if is_target else (0, 255, 255)))
+        overlays.append(('circle', center, (0, 0, 255)))
+        if is_target and confidence > best:
+            best = confidence
+            distance, area, x_dobj, y_dobj, z_dobj, hit = cnt_distance, cnt_area, x, y, z, bbox
+            polygon = approx
+
+    if best >= 0:
+        overlays.append(('text', f"{params.target_shape}:{distance}", (0, 25), (0, 255, 0)))
+    if count:
+        overlays.append(('circle', (img_size[1] // 2, img_size[0] // 2), (0, 255, 0)))
+
+    targets = targets[:count]
+    if count > 1:
+        targets = targets[np.argsort(-targets['confidence'], kind='stable')]
+
+    if start:
+        elapsed = time.perf_counter() - start
+        if distance_time is not None:
+            profiler.add('distance', distance_time)
+            elapsed -= distance_time
+        profiler.add('shape', elapsed)
+
+    return Detection(mask, {
+        'x_dobj': x_dobj,
+        'y_dobj': y_dobj,
+        'z_dobj': z_dobj,
+        'dobj': distance,
+        'area': area,
+    }, overlays, hit, targets, polygon)
+
+
+def classify(sides: int) -> int:
+    """Código de la figura según el número de lados del polígono aproximado (0 = ninguna)."""
+    for code, shape in SHAPE_CODES.items():
+        if sides >= 3 and shape.eval_sides(sides):
+            return code
+    return 0
+
+
+def shape_code(shape: Shape) -> int:
+    for code, known in SHAPE_CODES.items():
+        if type(known) is type(shape):
+            return code
+    return 0
+
+
+def shape_confidence(shape: Shape, approx, area: float, perimeter: float) -> float:
+    """
+    Qué tanto se parece el contorno a la figura, entre 0 y 1: circularidad
+    (4πA/P²) para el círculo, y para los polígonos la razón entre el área del
+    contorno y la del polígono aproximado.
+    """
+    if isinstance(shape, Circle):
+        return min(1., 4 * np.pi * area / perimeter**2) if perimeter else 0.
+    polygon = cv2.contourArea(approx)
+    return min(area, polygon) / max(area, polygon) if polygon else 0.
+
+
+def position(img_size, distance, cnt, params: DetectionParams):
+    """
+    Descompone `distance` en coordenadas (cm) respecto al centro de la imagen,
+    con el eje Y hacia arriba:
+        x = (cx - ancho / 2) * distancia / focal_lenght
+    Retorna `(x, y, z, (cx, cy))`, con el centroide (cx, cy) en píxeles.
+    """
+    width = img_size[1]
+    heigth = img_size[0]
+
+    M = cv2.moments(cnt)
+    if M["m00"] != 0:  # Evita división por cero
+        x_obj = int(M["m10"] / M["m00"])
+        y_obj = int(M["m01"] / M["m00"])
+    else:
+        x_obj, y_obj = 0, 0
+
+    factor = (distance / params.focal_lenght)
+    x_dobj = (x_obj - width / 2) * factor
+    y_dobj = (heigth / 2 - y_obj) * factor  # Invertir eje Y
+    return x_dobj, y_dobj, distance, (x_obj, y_obj)
+
+
+def targets_to_list(targets: np.ndarray, top: Optional[int] = None) -> List[dict]:
+    """Las primeras `top` filas de `targets` como dicts, sólo al serializar la respuesta."""
+    rows = targets if top is None else targets[:top]
+    return [{
+        'shape': str(SHAPE_CODES[int(row['shape'])]),
+        'confidence': float(row['confidence']),
+        'area': float(row['area']),
+        'centroid': [float(row['cx']), float(row['cy'])],
+        'x_dobj': float(row['x']),
+        'y_dobj': float(row['y']),
+        'z_dobj': float(row['z']),
+        'bbox': [int(row['bx']), int(row['by']), int(row['bw']), int(row['bh'])],
+    } for row in rows]
+
+
+class RoiTracker:
+    """
+    Busca el objetivo sólo alrededor de la última detección.
+
+    Vuelve a la búsqueda en todo el frame tras `max_misses` fallos seguidos o
+    cada `full_every` frames, para no perder objetivos nuevos.
+    """
+
+    def __init__(self, margin: float = 0.5, max_misses: int = 3, full_every: int = 30, min_size: int = 64):
+        self.margin = margin
+        self.max_misses = max_misses
+        self.full_every = full_every
+        self.min_size = min_size
+        self.reset()
+
+    def reset(self):
+        self.roi: Optional[Tuple[int, int, int, int]] = None
+        self.misses = 0
+        self.count = 0
+
+    def next_roi(self, shape) -> Optional[Tuple[int, int, int, int]]:
+        """Calcula la región a buscar en el siguiente frame (`None` = frame completo)."""
+        self.count += 1
+        if self.roi is None or (self.full_every and self.count % self.full_every == 0):
+            return None
+
+        x, y, w, h = self.roi
+        pad_x = max(int(w * self.margin), (self.min_size - w) // 2, 0)
+        pad_y = max(int(h * self.margin), (self.min_size - h) // 2, 0)
+        x0 = max(x - pad_x, 0)
+        y0 = max(y - pad_y, 0)
+        x1 = min(x + w + pad_x, shape[1])
+        y1 = min(y + h + pad_y, shape[0])
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def detect(self, frame: np.ndarray, params: DetectionParams) -> Detection:
+        detection = detect_region(frame, params, self.next_roi(frame.shape))
+        if detection.hit is not None:
+            self.roi = detection.hit
+            self.misses = 0
+        else:
+            self.misses += 1
+            if self.misses >= self.max_misses:
+                self.roi = None
+        return detection
+
+
+class FlowTracker:
+    """
+    Detección completa sólo uno de cada `detect_every` frames.
+
+    En los frames intermedios sigue los vértices del objetivo
+    (`Detection.polygon`) con flujo óptico Lucas-Kanade, sólo en una región
+    alrededor del polígono (`margin`, como `RoiTracker`), y recalcula la
+    distancia y el XY con el polígono seguido. Si algún vértice se pierde
+    (estado de LK o error de ida y vuelta mayor a `max_error` px) o el área
+    cambia más de `max_scale` veces respecto a la última detección, hace la
+    detección completa en ese mismo frame.
+    """
+
+    def __init__(self, detect_every: int = 5, max_error: float = 1.5, max_scale: float = 1.5,
+                 margin: float = 0.5, win_size: int = 21, levels: int = 3):
+        self.detect_every = max(1, detect_every)
+        self.max_error = max_error
+        self.max_scale = max_scale
+        self.margin = margin
+        self.win_size = win_size
+        self.lk = dict(winSize=(win_size, win_size), maxLevel=levels,
+                       criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        self.flow_count = 0  # frames resueltos con flujo óptico
+        self.fallbacks = 0  # frames en que el seguimiento falló y se volvió a detectar
+        self.reset()
+
+    def reset(self):
+        self.frame: Optional[np.ndarray] = None
+        self.points: Optional[np.ndarray] = None
+        self.last: Optional[Detection] = None
+        self.shape: Optional[str] = None
+        self.area_scale = 1.
+        self.reference_area = 0.
+        self.confidence = 0.
+        self.count = 0
+
+    def detect(self, frame: np.ndarray, params: DetectionParams, full=detect) -> Detection:
+        """`full` es la detección completa (`detect` o `RoiTracker.detect`)."""
+        self.count += 1
+        if self.points is not None and self.count % self.detect_every:
+            detection = self.follow(frame, params)
+            if detection is not None:
+                self.flow_count += 1
+                return detection
+            self.fallbacks += 1
+        detection = full(frame, params)
+        self.restart(frame, detection, params)
+        return detection
+
+    def restart(self, frame: np.ndarray, detection: Detection, params: DetectionParams):
+        """Toma los vértices de una detección completa como nuevos puntos a seguir."""
+        self.count = 0
+        self.points = None
+        if detection.polygon is None or len(detection.polygon) < 3:
+            return
+        points = detection.polygon.astype(np.float32).reshape(-1, 1, 2)
+        polygon_area = cv2.contourArea(points)
+        if not polygon_area:
+            return
+        self.frame = frame
+        self.points = points
+        self.last = detection
+        self.shape = str(params.target_shape)
+        # `measure` usa el área del contorno, no la del polígono: se conserva la proporción
+        self.area_scale = detection.metadata['area'] / polygon_area
+        self.reference_area = polygon_area
+        code = shape_code(params.target_shape)
+        rows = detection.targets[detection.targets['shape'] == code]
+        self.confidence = float(rows['confidence'][0]) if len(rows) else 0.
+
+    def follow(self, frame: np.ndarray, params: DetectionParams) -> Optional[Detection]:
+        """Mueve los vértices a `frame`; `None` si el seguimiento no es confiable."""
+        if str(params.target_shape) != self.shape:
+            return None
+        profiler = current_profiler()
+        t = profiler.start()
+        x, y, w, h = cv2.boundingRect(self.points)
+        pad = int(max(w, h) * self.margin) + self.win_size
+        x0, y0 = max(x - pad, 0), max(y - pad, 0)
+        x1, y1 = min(x + w + pad, frame.shape[1]), min(y + h + pad, frame.shape[0])
+        previous = cv2.cvtColor(self.frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        current = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        offset = np.array([x0, y0], np.float32)
+        start = self.points - offset
+        points, status, _ = cv2.calcOpticalFlowPyrLK(previous, current, start, None, **self.lk)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(current, previous, points, None, **self.lk)
+        profiler.stop('flow', t)
+        if not (status.all() and back_status.all()):
+            return None
+        if np.linalg.norm((back - start).reshape(-1, 2), axis=1).max() > self.max_error:
+            return None
+        points += offset
+        polygon_area = cv2.contourArea(points)
+        if not polygon_area or not 1 / self.max_scale <= polygon_area / self.reference_area <= self.max_scale:
+            return None
+
+        img_size = frame.shape
+        self.frame = frame
+        self.points = points
+        shape = params.target_shape
+        area = polygon_area * self.area_scale
+        distance = np.sqrt((shape.AREA * params.focal_lenght**2) / area)
+        x_dobj, y_dobj, z_dobj, center = position(img_size, distance, points, params)
+        hit = cv2.boundingRect(points)
+        polygon = np.round(points).astype(np.int32)
+
+        targets = np.empty(1, TARGET_DTYPE)
+        targets[0] = (shape_code(shape), self.confidence, area, center[0], center[1], x_dobj, y_dobj, z_dobj, *hit)
+        overlays: List[Overlay] = [
+            ('contour', polygon, (0, 255, 0)),
+            ('circle', center, (0, 0, 255)),
+            ('text', f"{shape}:{distance}", (0, 25), (0, 255, 0)),
+            ('circle', (img_size[1] // 2, img_size[0] // 2), (0, 255, 0)),
+        ]
+        return Detection(self.last.mask, {
+            'x_dobj': x_dobj,
+            'y_dobj': y_dobj,
+            'z_dobj': z_dobj,
+            'dobj': distance,
+            'area': area,
+        }, overlays, hit, targets, polygon)
+
+
+def find_contours(mask: np.ndarray, params: DetectionParams, offset: Tuple[int, int] = (0, 0)):
+    """Contornos a evaluar: todos, o sólo los que pasan el filtro de candidatos."""
+    profiler = current_profiler()
+    t = profiler.start()
+    if params.candidate_filter:
+        contours = get_candidates(mask, offset)
+    else:
+        contours = get_contours(mask, offset)
+    profiler.stop('contours', t)
+    return contours
+
+
+def get_candidates(mask: np.ndarray, offset: Tuple[int, int] = (0, 0), min_area: float = MIN_AREA,
+                   max_aspect: float = MAX_ASPECT, min_fill: float = MIN_FILL):
+    """
+    Contornos externos (sin agujeros) que pasan los filtros de área, relación
+    de aspecto y llenado de la caja, de mayor a menor área.
+
+    `boundingRect` y `contourArea` se apilan en arreglos y los filtros se
+    aplican con NumPy sobre todos los contornos a la vez.
+    """
+    contours = get_contours(mask, offset, cv2.RETR_EXTERNAL)
+    if not contours:
+        return []
+    boxes = np.array([cv2.boundingRect(cnt) for cnt in contours], np.float32)
+    areas = np.array([cv2.contourArea(cnt) for cnt in contours], np.float32)
+    widths, heights = boxes[:, 2], boxes[:, 3]
+
+    aspect = np.maximum(widths, heights) / np.maximum(np.minimum(widths, heights), 1)
+    fill = areas / (widths * heights)
+    keep = np.flatnonzero((areas > min_area) & (aspect <= max_aspect) & (fill >= min_fill))
+    keep = keep[np.argsort(-areas[keep], kind='stable')]
+    return [contours[idx] for idx in keep]
+
+
+def get_contours(mask, offset: Tuple[int, int] = (0, 0), mode: int = cv2.RETR_TREE):
+    """Obtiene los contornos de la máscara, desplazados por `offset`."""
+    if int(cv2.__version__[0]) > 3:
+        contours, _ = cv2.findContours(mask, mode, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+    else:
+        _, contours, _ = cv2.findContours(mask, mode, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+    return contours
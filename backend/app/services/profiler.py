@@ -0,0 +1,113 @@
+import threading
+import time
+import numpy as np
+from typing import Dict, Optional
+
+# Etapas medidas por el pipeline (en el orden en que ocurren)
+STAGES = ('capture', 'color', 'mask', 'erode', 'contours', 'shape', 'distance', 'flow', 'render')
+
+
+class SampleRing:
+    """Últimas `size` muestras de una etapa en un arreglo de tamaño fijo."""
+
+    def __init__(self, size: int):
+        self.samples = np.zeros(size)
+        self.count = 0
+
+    def add(self, value: float):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+
+    def values(self) -> np.ndarray:
+        return self.samples[:min(self.count, len(self.samples))].copy()
+
+    def rate(self) -> float:
+        """Eventos por segundo, si las muestras son instantes (`time.perf_counter`)."""
+        stamps = self.values()
+        if len(stamps) < 2:
+            return 0.
+        elapsed = stamps.max() - stamps.min()
+        return float((len(stamps) - 1) / elapsed) if elapsed > 0 else 0.
+
+
+class Profiler:
+    """
+    Tiempos por etapa del pipeline de detección.
+
+    Uso en el código medido:
+
+        t = profiler.start()          # 0. si está desactivado
+        ...
+        t = profiler.stop('color', t) # registra y retorna el instante actual
+
+    Desactivado, cada medición cuesta una llamada y una comparación, sin leer
+    el reloj (ver `tests/bench_profiler.py`). Los FPS se miden siempre.
+    """
+
+    def __init__(self, size: int = 1024, enabled: bool = False):
+        self.size = size
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self._stages: Dict[str, SampleRing] = {name: SampleRing(self.size) for name in STAGES}
+        self._frames = SampleRing(self.size)
+
+    def bind(self):
+        """Usa este profiler para lo que mida `processing` en el hilo actual."""
+        _local.profiler = self
+
+    def start(self) -> float:
+        return time.perf_counter() if self.enabled else 0.
+
+    def stop(self, stage: str, start: float) -> float:
+        """Registra el tiempo desde `start`; retorna el instante actual para encadenar etapas."""
+        if not start:
+            return 0.
+        now = time.perf_counter()
+        self.add(stage, now - start)
+        return now
+
+    def add(self, stage: str, seconds: float):
+        ring = self._stages.get(stage)
+        if ring is None:
+            ring = self._stages.setdefault(stage, SampleRing(self.size))
+        ring.add(seconds)
+
+    def tick(self):
+        """Marca un frame publicado (para calcular los FPS)."""
+        self._frames.add(time.perf_counter())
+
+    def fps(self) -> float:
+        return self._frames.rate()
+
+    def summary(self) -> Dict[str, Optional[dict]]:
+        """p50/p95/p99 y media por etapa, en milisegundos."""
+        stages = {}
+        for name, ring in list(self._stages.items()):
+            values = ring.values()
+            if not len(values):
+                stages[name] = None
+                continue
+            p50, p95, p99 = np.percentile(values, (50, 95, 99)) * 1000
+            stages[name] = {
+                'count': ring.count,
+                'mean': float(values.mean() * 1000),
+                'p50': float(p50),
+                'p95': float(p95),
+                'p99': float(p99),
+            }
+        return {'enabled': self.enabled, 'fps': self.fps(), 'stages': stages}
+
+
+# Instancia de los hilos sin profiler propio (benchmarks, scripts). Cada
+# `Camera` tiene el suyo y lo asocia a sus hilos con `bind`. Cada proceso
+# tiene su propia copia: con el pipeline 'processes' las etapas de
+# detección se miden en los workers y no aparecen en la cámara.
+profiler = Profiler()
+_local = threading.local()
+
+
+def current_profiler() -> Profiler:
+    """Profiler del hilo actual: el de la cámara que lo ejecuta o `profiler`."""
+    return getattr(_local, 'profiler', profiler)
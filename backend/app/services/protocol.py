@@ -0,0 +1,216 @@
+"""
+Protocolo binario entre la cámara y el ESP32 (versión 1).
+
+Cada mensaje, en little-endian:
+
+    sync     2 B   0xAA 0x55
+    versión  1 B
+    tipo     1 B   DATA, HELLO, ACCEPT o READY
+    seq      2 B   contador de mensajes DATA (detecta pérdidas)
+    stamp    4 B   instante de captura del frame, en ms (módulo 2³²)
+    largo    1 B   bytes de payload (0..255)
+    payload
+    crc      2 B   CRC-16/CCITT-FALSE de versión..payload
+
+El payload de DATA son registros `RECORD_DTYPE` de 18 bytes: primero el
+objetivo principal (`Camera.metadata`, con su velocidad si el tracker está
+activo) y después las figuras extra de `uart_targets`. Posiciones en mm,
+velocidades en mm/s, confianza en 0..255 (0 = posición predicha, sin medición).
+
+Negociación: el ESP32 envía HELLO (payload: versión más alta que entiende y,
+opcional, banderas), la cámara responde ACCEPT (versión elegida y banderas) y
+desde ahí cada READY del ESP32 pide el siguiente DATA. Con la bandera STREAM
+(pedida en HELLO o activada con `uart_streaming`) no hace falta READY: la
+cámara envía cada resultado nuevo hasta `uart_max_rate` por segundo. Si en
+cambio llega la línea "RECEIVING DATA" se sigue con el protocolo de texto de
+siempre (versión 0).
+"""
+import binascii
+import struct
+import numpy as np
+from typing import List, NamedTuple, Optional, Union
+
+SYNC = b'\xaa\x55'
+VERSION = 1
+LEGACY_VERSION = 0
+LEGACY_HANDSHAKE = 'RECEIVING DATA'
+
+# Tipos de mensaje
+DATA = 0x01    # cámara -> ESP32: registros de figuras
+HELLO = 0x02   # ESP32 -> cámara: payload = versión máxima soportada
+ACCEPT = 0x03  # cámara -> ESP32: payload = versión elegida
+READY = 0x04   # ESP32 -> cámara: listo para el siguiente DATA
+
+# Banderas de HELLO y ACCEPT
+STREAM = 0x01  # enviar DATA sin esperar READY
+
+HEADER = struct.Struct('<2sBBHIB')
+CRC = struct.Struct('<H')
+MAX_PAYLOAD = 255
+
+RECORD_DTYPE = np.dtype([
+    ('shape', 'u1'), ('confidence', 'u1'), ('x', '<i2'), ('y', '<i2'), ('z', '<u2'),
+    ('vx', '<i2'), ('vy', '<i2'), ('vz', '<i2'), ('area', '<u4'),
+])
+MAX_RECORDS = MAX_PAYLOAD // RECORD_DTYPE.itemsize
+MM_PER_CM = 10.
+
+# Rango de cada campo entero, para saturar en vez de desbordar
+_LIMITS = {name: (int(np.iinfo(RECORD_DTYPE[name]).min), int(np.iinfo(RECORD_DTYPE[name]).max))
+           for name in RECORD_DTYPE.names}
+
+
+class Frame(NamedTuple):
+    version: int
+    kind: int
+    seq: int
+    stamp: int  # ms
+    payload: bytes
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16/CCITT-FALSE (polinomio 0x1021, inicial 0xFFFF)."""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(kind: int, seq: int = 0, stamp: int = 0, payload: bytes = b'', version: int = VERSION) -> bytes:
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Payload de {len(payload)} bytes (máximo {MAX_PAYLOAD})")
+    body = HEADER.pack(SYNC, version, kind, seq & 0xFFFF, stamp & 0xFFFFFFFF, len(payload)) + payload
+    return body + CRC.pack(crc16(body[len(SYNC):]))
+
+
+def stamp_ms(stamp: float) -> int:
+    """Instante en segundos (`time.perf_counter`) como ms de 32 bits."""
+    return int(stamp * 1000) & 0xFFFFFFFF
+
+
+def _saturate(value: float, name: str) -> int:
+    low, high = _LIMITS[name]
+    return min(max(round(value), low), high)
+
+
+def _saturate_array(values: np.ndarray, name: str) -> np.ndarray:
+    return np.clip(np.round(values), *_LIMITS[name])
+
+
+def make_records(metadata: dict, targets: np.ndarray, shape: int, extra: int = 0) -> np.ndarray:
+    """
+    Registros de un frame: el objetivo principal (`shape` es su código, como
+    en `SHAPE_CODES`) y las primeras `extra` figuras de `targets`.
+    """
+    extra = min(extra, len(targets), MAX_RECORDS - 1)
+    records = np.empty(1 + extra, RECORD_DTYPE)
+
+    # La primera fila de la figura buscada es la de más confianza (como en `measure`)
+    confidence = 0.
+    for code, value in zip(targets['shape'].tolist(), targets['confidence'].tolist()):
+        if code == shape:
+            confidence = value
+            break
+    records[0] = (
+        shape,
+        _saturate(confidence * 255, 'confidence'),
+        *(_saturate(metadata.get(key, 0.) * MM_PER_CM, field)
+          for field, key in (('x', 'x_dobj'), ('y', 'y_dobj'), ('z', 'z_dobj'), ('vx', 'vx'), ('vy', 'vy'), ('vz', 'vz'))),
+        _saturate(metadata.get('area', 0.), 'area'),
+    )
+
+    if extra:
+        rows = targets[:extra]
+        rest = records[1:]
+        rest['shape'] = rows['shape']
+        rest['confidence'] = _saturate_array(rows['confidence'] * 255, 'confidence')
+        for field in ('x', 'y', 'z'):
+            rest[field] = _saturate_array(rows[field] * MM_PER_CM, field)
+        rest[['vx', 'vy', 'vz']] = 0
+        rest['area'] = _saturate_array(rows['area'], 'area')
+    return records
+
+
+def encode_data(seq: int, stamp: int, records: np.ndarray) -> bytes:
+    return encode_frame(DATA, seq, stamp, records[:MAX_RECORDS].tobytes())
+
+
+def decode_records(payload: bytes) -> List[dict]:
+    """Payload de DATA a registros en cm, cm/s y confianza 0..1 (como `targets_to_list`)."""
+    count = len(payload) // RECORD_DTYPE.itemsize
+    records = np.frombuffer(payload[:count * RECORD_DTYPE.itemsize], RECORD_DTYPE)
+    return [{
+        'shape': int(row['shape']),
+        'confidence': int(row['confidence']) / 255,
+        'x': int(row['x']) / MM_PER_CM,
+        'y': int(row['y']) / MM_PER_CM,
+        'z': int(row['z']) / MM_PER_CM,
+        'vx': int(row['vx']) / MM_PER_CM,
+        'vy': int(row['vy']) / MM_PER_CM,
+        'vz': int(row['vz']) / MM_PER_CM,
+        'area': int(row['area']),
+    } for row in records]
+
+
+class FrameDecoder:
+    """
+    Separa los mensajes de un flujo de bytes del puerto serie.
+
+    `feed` retorna los `Frame` válidos y, como `str`, las líneas de texto que
+    llegan fuera de un mensaje (p. ej. "RECEIVING DATA" o logs del ESP32).
+    Un mensaje con CRC o largo inválido se descarta y se busca el siguiente
+    sync; `errors` cuenta los descartes.
+    """
+
+    def __init__(self, max_line: int = 256):
+        self.max_line = max_line
+        self.errors = 0
+        self._buffer = bytearray()
+        self._text = bytearray()
+
+    def feed(self, data: bytes) -> List[Union[Frame, str]]:
+        self._buffer += data
+        out: List[Union[Frame, str]] = []
+        while self._buffer:
+            start = self._buffer.find(SYNC)
+            if start < 0:
+                # Puede que el último byte sea la primera mitad del sync
+                keep = 1 if self._buffer[-1:] == SYNC[:1] else 0
+                self._add_text(self._buffer[:len(self._buffer) - keep], out)
+                del self._buffer[:len(self._buffer) - keep]
+                break
+            if start:
+                self._add_text(self._buffer[:start], out)
+                del self._buffer[:start]
+
+            if len(self._buffer) < HEADER.size:
+                break
+            _, version, kind, seq, stamp, length = HEADER.unpack_from(self._buffer)
+            end = HEADER.size + length + CRC.size
+            if len(self._buffer) < end:
+                break
+            body = bytes(self._buffer[len(SYNC):end - CRC.size])
+            (crc,) = CRC.unpack_from(self._buffer, end - CRC.size)
+            if crc != crc16(body):
+                self.errors += 1
+                del self._buffer[:1]
+                continue
+            out.append(Frame(version, kind, seq, stamp, bytes(self._buffer[HEADER.size:end - CRC.size])))
+            del self._buffer[:end]
+        return out
+
+    def _add_text(self, data: bytes, out: List[Union[Frame, str]]):
+        self._text += data
+        while True:
+            end = self._text.find(b'\n')
+            if end < 0:
+                break
+            line = self._text[:end].decode('utf-8', errors='replace').strip()
+            del self._text[:end + 1]
+            if line:
+                out.append(line)
+        if len(self._text) > self.max_line:
+            del self._text[:-self.max_line]
+
+
+def negotiate(offered: int) -> Optional[int]:
+    """Versión a usar con un ESP32 que ofrece hasta `offered` (`None` si no hay ninguna en común)."""
+    version = min(offered, VERSION)
+    return version if version >= 1 else None
@@ -0,0 +1,198 @@
+import json
+import os
+import cv2
+import numpy as np
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from app.models.shapes import ShapeType
+
+# Color BGR del objetivo: dentro del rango HSV por defecto de `config.json`
+TARGET_COLOR = (60, 220, 60)
+# Colores del relleno: fuera de ese rango
+CLUTTER_COLORS = [(200, 60, 60), (40, 40, 200), (200, 60, 200), (128, 128, 128), (30, 120, 230)]
+
+SHAPES = {
+    'quadrilateral': ShapeType.QUADRILATERAL.value,
+    'triangle': ShapeType.TRIANGLE.value,
+    'circle': ShapeType.CIRCLE.value,
+}
+
+
+class Target(NamedTuple):
+    """Objetivo en coordenadas reales (cm), con el mismo sistema que `position` en `processing`."""
+    shape: str
+    distance: float
+    x: float = 0.
+    y: float = 0.
+
+
+class Scene(NamedTuple):
+    frame: np.ndarray
+    target: Target
+    truth: dict  # mismas claves que `Camera.metadata`
+
+
+def shape_points(shape: str, area: float, center: Tuple[float, float]) -> np.ndarray:
+    """Vértices (o contorno, para el círculo) de la figura con `area` píxeles."""
+    cx, cy = center
+    if shape == 'quadrilateral':
+        half = np.sqrt(area) / 2
+        points = [(cx - half, cy - half), (cx + half, cy - half), (cx + half, cy + half), (cx - half, cy + half)]
+    elif shape == 'triangle':
+        # Triángulo equilátero con el centroide en `center`
+        side = np.sqrt(4 * area / np.sqrt(3))
+        height = side * np.sqrt(3) / 2
+        points = [(cx, cy - 2 * height / 3), (cx + side / 2, cy + height / 3), (cx - side / 2, cy + height / 3)]
+    elif shape == 'circle':
+        radius = np.sqrt(area / np.pi)
+        angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+        points = np.stack([cx + radius * np.cos(angles), cy + radius * np.sin(angles)], axis=1)
+    else:
+        raise ValueError(f"Figura desconocida: {shape}")
+    return np.round(np.asarray(points) * 16).astype(np.int32)  # 4 bits de subpíxel para `fillPoly`
+
+
+class SceneGenerator:
+    """
+    Genera frames con un objetivo de área real conocida (`app/models/shapes.py`)
+    a la distancia y desplazamiento pedidos.
+
+    El tamaño en píxeles sale de invertir la distancia que calcula `measure`
+    (distancia = sqrt(AREA * focal_lenght² / area_px)):
+        area_px = AREA * focal_lenght² / distancia²
+    y la posición de invertir `position`:
+        x_px = x * focal_lenght / distancia (respecto al centro, eje Y hacia arriba)
+
+    Degradaciones opcionales: ruido gaussiano (`noise`, desviación en niveles
+    de gris), desenfoque (`blur`, tamaño del kernel), `clutter` figuras de
+    relleno fuera del rango HSV y cambios de iluminación (`lighting`, 0..1:
+    ganancia aleatoria y gradiente horizontal).
+    """
+
+    def __init__(self, size: Tuple[int, int] = (640, 480), focal_lenght: float = 600., noise: float = 0.,
+                 blur: int = 0, clutter: int = 0, lighting: float = 0., seed: Optional[int] = None,
+                 color: Tuple[int, int, int] = TARGET_COLOR):
+        self.size = size
+        self.focal_lenght = focal_lenght
+        self.noise = noise
+        self.blur = blur
+        self.clutter = clutter
+        self.lighting = lighting
+        self.color = color
+        self.rng = np.random.default_rng(seed)
+
+    def project(self, target: Target) -> Tuple[float, Tuple[float, float]]:
+        """Área (px) y centro (px) del objetivo en la imagen."""
+        width, height = self.size
+        area = SHAPES[target.shape].AREA * self.focal_lenght ** 2 / target.distance ** 2
+        factor = self.focal_lenght / target.distance
+        return area, (width / 2 + target.x * factor, height / 2 - target.y * factor)
+
+    def render(self, target: Target) -> Scene:
+        width, height = self.size
+        frame = self.rng.integers(0, 30, (height, width, 3), np.uint8)
+
+        for _ in range(self.clutter):
+            center = tuple(int(v) for v in self.rng.integers(0, (width, height)))
+            radius = int(self.rng.integers(4, max(5, min(width, height) // 10)))
+            color = CLUTTER_COLORS[int(self.rng.integers(len(CLUTTER_COLORS)))]
+            if self.rng.random() < .5:
+                cv2.circle(frame, center, radius, color, -1)
+            else:
+                cv2.rectangle(frame, (center[0] - radius, center[1] - radius),
+                              (center[0] + radius, center[1] + radius), color, -1)
+
+        area, center = self.project(target)
+        cv2.fillPoly(frame, [shape_points(target.shape, area, center)], self.color, cv2.LINE_AA, shift=4)
+
+        if self.lighting:
+            gain = 1 + self.rng.uniform(-self.lighting, self.lighting)
+            gradient = np.linspace(1 - self.lighting / 2, 1 + self.lighting / 2, width, dtype=np.float32)
+            frame = cv2.convertScaleAbs(frame.astype(np.float32) * (gain * gradient)[None, :, None])
+        if self.blur > 1:
+            kernel = self.blur | 1
+            frame = cv2.GaussianBlur(frame, (kernel, kernel), 0)
+        if self.noise:
+            noisy = frame.astype(np.float32) + self.rng.normal(0, self.noise, frame.shape).astype(np.float32)
+            frame = np.clip(noisy, 0, 255).astype(np.uint8)
+
+        truth = {
+            'x_dobj': float(target.x),
+            'y_dobj': float(target.y),
+            'z_dobj': float(target.distance),
+            'dobj': float(target.distance),
+            'area': float(area),
+        }
+        return Scene(frame, target, truth)
+
+    def sweep(self, shapes: Sequence[str] = tuple(SHAPES), distances: Sequence[float] = (50., 100., 150., 200.),
+              offsets: Sequence[Tuple[float, float]] = ((0., 0.),)) -> Iterator[Scene]:
+        """Todas las combinaciones de figura, distancia y desplazamiento (cm)."""
+        for shape in shapes:
+            for distance in distances:
+                for x, y in offsets:
+                    yield self.render(Target(shape, distance, x, y))
+
+    def random(self, count: Optional[int] = None, shapes: Sequence[str] = tuple(SHAPES),
+               distance: Tuple[float, float] = (40., 250.)) -> Iterator[Scene]:
+        """Objetivos al azar que caben en la imagen; `count=None` genera sin fin."""
+        width, height = self.size
+        produced = 0
+        while count is None or produced < count:
+            shape = shapes[int(self.rng.integers(len(shapes)))]
+            dist = self.rng.uniform(*distance)
+            area, _ = self.project(Target(shape, dist))
+            # Margen para que la figura completa quede dentro del frame
+            margin = np.sqrt(area) * .8
+            max_x = max(0., (width / 2 - margin) * dist / self.focal_lenght)
+            max_y = max(0., (height / 2 - margin) * dist / self.focal_lenght)
+            yield self.render(Target(shape, dist, self.rng.uniform(-max_x, max_x), self.rng.uniform(-max_y, max_y)))
+            produced += 1
+
+
+def frames(scenes: Iterable[Scene]) -> Iterator[np.ndarray]:
+    """Sólo los frames, para `SyntheticSource`."""
+    for scene in scenes:
+        yield scene.frame
+
+
+def write_scenes(scenes: Iterable[Scene], path: str, fps: float = 30.) -> int:
+    """
+    Guarda las escenas en disco. Si `path` termina en `.mp4`/`.avi` se escribe
+    un video; si no, un directorio de PNG legible por `ImageDirSource`. En ambos
+    casos la verdad de cada frame va en `<path>.truth.jsonl` (o `truth.jsonl`
+    dentro del directorio). Retorna el número de frames escritos.
+    """
+    video = path.lower().endswith(('.mp4', '.avi'))
+    if video:
+        truth_path = os.path.splitext(path)[0] + '.truth.jsonl'
+    else:
+        os.makedirs(path, exist_ok=True)
+        truth_path = os.path.join(path, 'truth.jsonl')
+
+    writer = None
+    count = 0
+    with open(truth_path, 'w') as truth_file:
+        for scene in scenes:
+            if video:
+                if writer is None:
+                    height, width = scene.frame.shape[:2]
+                    fourcc = cv2.VideoWriter_fourcc(*('mp4v' if path.lower().endswith('.mp4') else 'MJPG'))
+                    writer = cv2.VideoWriter(path, fourcc, fps, (width, height))
+                writer.write(scene.frame)
+            else:
+                cv2.imwrite(os.path.join(path, f'frame_{count:06d}.png'), scene.frame)
+            truth_file.write(json.dumps({'frame': count, 'shape': scene.target.shape, **scene.truth}) + '\n')
+            count += 1
+    if writer is not None:
+        writer.release()
+    return count
+
+
+def read_truth(path: str) -> List[dict]:
+    """Lee la verdad escrita por `write_scenes` (ruta del video o del directorio)."""
+    if os.path.isdir(path):
+        truth_path = os.path.join(path, 'truth.jsonl')
+    else:
+        truth_path = os.path.splitext(path)[0] + '.truth.jsonl'
+    with open(truth_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,175 @@
+import os
+import time
+import cv2
+import numpy as np
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from app.services.scenes import SceneGenerator, frames
+
+
+class FrameSource:
+    """Interfaz común para cualquier origen de frames que consume `Camera`."""
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Devuelve `(ret, frame)` igual que `cv2.VideoCapture.read`."""
+        raise NotImplementedError
+
+    def release(self):
+        """Libera los recursos de la fuente."""
+        pass
+
+    def is_opened(self) -> bool:
+        return True
+
+
+class DeviceSource(FrameSource):
+    """Cámara física abierta con `cv2.VideoCapture`."""
+
+    def __init__(self, index: int = 0):
+        self.index = index
+        self.cap = cv2.VideoCapture(index)
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+
+class ReplaySource(FrameSource):
+    """
+    Base para fuentes grabadas. Con `realtime=True` respeta los FPS de la
+    grabación; con `realtime=False` entrega los frames tan rápido como se pidan.
+    """
+
+    def __init__(self, fps: float = 30., realtime: bool = True, loop: bool = False):
+        self.fps = fps if fps and fps > 0 else 30.
+        self.realtime = realtime
+        self.loop = loop
+        self._next_time = None
+
+    def _pace(self):
+        """Espera hasta el instante del siguiente frame si se reproduce en tiempo real."""
+        if not self.realtime:
+            return
+        now = time.perf_counter()
+        if self._next_time is None or now - self._next_time > 1.:
+            # Primer frame o el consumidor se quedó muy atrás: se reinicia el reloj
+            self._next_time = now
+        elif self._next_time > now:
+            time.sleep(self._next_time - now)
+        self._next_time += 1. / self.fps
+
+
+class VideoFileSource(ReplaySource):
+    """Reproduce un archivo de video."""
+
+    def __init__(self, path: str, realtime: bool = True, loop: bool = False, fps: Optional[float] = None):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        super().__init__(fps or self.cap.get(cv2.CAP_PROP_FPS), realtime, loop)
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if ret:
+            self._pace()
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+
+class SyntheticSource(ReplaySource):
+    """
+    Entrega frames ya cargados en memoria (lista de arrays o un generador).
+    El pipeline no modifica los frames, así que se entregan sin copiar.
+    """
+
+    def __init__(self, frames: Union[Sequence[np.ndarray], Iterable[np.ndarray]],
+                 fps: float = 30., realtime: bool = False, loop: bool = True):
+        super().__init__(fps, realtime, loop)
+        self._frames: Optional[List[np.ndarray]] = frames if isinstance(frames, (list, tuple)) else None
+        self._iter: Optional[Iterator[np.ndarray]] = None if self._frames is not None else iter(frames)
+        self._pos = 0
+
+    def read(self):
+        if self._frames is not None:
+            if self._pos >= len(self._frames):
+                if not self.loop or not self._frames:
+                    return False, None
+                self._pos = 0
+            frame = self._frames[self._pos]
+            self._pos += 1
+        else:
+            frame = next(self._iter, None)
+            if frame is None:
+                return False, None
+        self._pace()
+        return True, frame
+
+    def release(self):
+        self._frames = None
+        self._iter = None
+
+    def is_opened(self):
+        return self._frames is not None or self._iter is not None
+
+
+class ImageDirSource(SyntheticSource):
+    """Reproduce las imágenes de un directorio (orden alfabético) como si fueran un video."""
+
+    EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+    def __init__(self, path: str, fps: float = 30., realtime: bool = False, loop: bool = True,
+                 size: Optional[Tuple[int, int]] = None):
+        self.path = path
+        frames = []
+        for name in sorted(os.listdir(path)):
+            if not name.lower().endswith(self.EXTENSIONS):
+                continue
+            img = cv2.imread(os.path.join(path, name))
+            if img is None:
+                continue
+            if size is not None:
+                img = cv2.resize(img, size)
+            frames.append(img)
+        super().__init__(frames, fps, realtime, loop)
+
+
+def create_source(config: dict) -> FrameSource:
+    """
+    Crea la fuente de frames a partir de la configuración.
+
+    La clave opcional `source` admite:
+        - {"type": "device"}: usa `cam_idx` (comportamiento por defecto).
+        - {"type": "video", "path": ..., "realtime": bool, "loop": bool}
+        - {"type": "images", "path": ..., "fps": float, "realtime": bool, "loop": bool}
+        - {"type": "scene", "size": [w, h], "fps": float, "realtime": bool, "noise": float,
+           "blur": int, "clutter": int, "lighting": float, "seed": int}: objetivos al azar
+           generados con `app/services/scenes.py`, sin cámara
+    """
+    source = config.get('source') or {'type': 'device'}
+    kind = source.get('type', 'device')
+
+    if kind == 'device':
+        return DeviceSource(source.get('index', config['cam_idx']))
+    if kind == 'video':
+        return VideoFileSource(source['path'], realtime=source.get('realtime', True),
+                               loop=source.get('loop', False), fps=source.get('fps'))
+    if kind == 'images':
+        return ImageDirSource(source['path'], fps=source.get('fps', 30.),
+                              realtime=source.get('realtime', False), loop=source.get('loop', True))
+    if kind == 'scene':
+        options = {key: source[key] for key in ('noise', 'blur', 'clutter', 'lighting', 'seed') if key in source}
+        generator = SceneGenerator(tuple(source.get('size', (640, 480))), config['focal_lenght'], **options)
+        return SyntheticSource(frames(generator.random()), fps=source.get('fps', 30.),
+                               realtime=source.get('realtime', True), loop=False)
+    raise ValueError(f"Tipo de fuente desconocido: {kind}")
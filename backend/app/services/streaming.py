@@ -0,0 +1,183 @@
+import time
+import cv2
+from threading import Lock
+from typing import Dict, NamedTuple, Optional, Tuple
+from app.services.broadcast import MetadataBroadcaster
+from app.services.camera import Camera
+from app.services.mask_codec import encode_mask, pack_mask
+
+# Calidad JPEG por defecto de OpenCV
+DEFAULT_QUALITY = 95
+
+
+class FrameEncoder:
+    """
+    Caché de frames codificados compartida por todos los clientes MJPEG.
+
+    Cada frame publicado por la cámara se codifica como mucho una vez por
+    variante (tipo `video`/`mask`, ancho, calidad y formato), sin importar
+    cuántos clientes pidan esa misma variante. La máscara además puede ir sin
+    pérdida como PNG de 1 bit (`png`) o como bits comprimidos (`bits`).
+    """
+
+    # Variantes sin pedir durante este número de frames se eliminan de la caché
+    MAX_AGE = 30
+
+    def __init__(self, cam: Camera):
+        self.cam = cam
+        self._cache: Dict[tuple, Tuple[int, bytes]] = {}
+        self._locks: Dict[tuple, Lock] = {}
+        self._locks_lock = Lock()
+
+        # Contadores para `/metrics`; sólo se suman, nunca se leen con lock
+        self.clients = 0
+        self.bytes_sent = 0
+        self.encode_count = 0
+        self.encode_seconds = 0.
+
+    @staticmethod
+    def variant(kind: str = 'video', width: Optional[int] = None, quality: Optional[int] = None, fmt: str = 'jpeg') -> tuple:
+        """Normaliza la variante pedida para que clientes parecidos compartan la misma."""
+        if kind != 'mask':
+            fmt = 'jpeg'
+        if width is not None:
+            width = max(32, int(width) // 32 * 32)
+        if fmt != 'jpeg':
+            quality = 0
+        else:
+            quality = DEFAULT_QUALITY if quality is None else min(100, max(5, int(quality) // 5 * 5))
+        return (kind, width, quality, fmt)
+
+    def cached(self, variant: tuple, frame_id: int) -> Optional[bytes]:
+        """Retorna los bytes de `frame_id` si ya fue codificado."""
+        cached = self._cache.get(variant)
+        if cached is not None and cached[0] == frame_id:
+            return cached[1]
+        return None
+
+    def _lock_for(self, variant: tuple) -> Lock:
+        lock = self._locks.get(variant)
+        if lock is None:
+            with self._locks_lock:
+                lock = self._locks.setdefault(variant, Lock())
+        return lock
+
+    def get(self, variant: tuple = ('video', None, DEFAULT_QUALITY, 'jpeg')) -> Tuple[int, Optional[bytes]]:
+        """Retorna `(frame_id, datos)` del último frame; `datos` es `None` si aún no hay frame."""
+        frame_id = self.cam.frame_id
+        cached = self._cache.get(variant)
+        if cached is not None and cached[0] == frame_id:
+            return cached
+
+        with self._lock_for(variant):
+            # Otro cliente pudo haberlo codificado mientras se esperaba el lock
+            cached = self._cache.get(variant)
+            if cached is not None and cached[0] == frame_id:
+                return cached
+
+            kind, width, quality, fmt = variant
+            frame = self.cam.get_mask() if kind == 'mask' else self.cam.get_frame()
+            if frame is None:
+                return frame_id, None
+            if width is not None and width < frame.shape[1]:
+                height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+                interpolation = cv2.INTER_NEAREST if kind == 'mask' else cv2.INTER_AREA
+                frame = cv2.resize(frame, (width, height), interpolation=interpolation)
+
+            start = time.perf_counter()
+            if fmt == 'bits':
+                data = pack_mask(frame)
+            elif fmt == 'png':
+                data = encode_mask(frame, 'png')
+            else:
+                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if not ret:
+                    return frame_id, None
+                data = buffer.tobytes()
+            self.encode_seconds += time.perf_counter() - start
+            self.encode_count += 1
+            cached = (frame_id, data)
+            self._cache[variant] = cached
+            self._evict(frame_id)
+            return cached
+
+    def _evict(self, frame_id: int):
+        """Elimina las variantes que ningún cliente ha pedido recientemente."""
+        for variant, (cached_id, _) in list(self._cache.items()):
+            if frame_id - cached_id > self.MAX_AGE:
+                self._cache.pop(variant, None)
+
+
+class StreamControl:
+    """
+    Ajustes de un cliente MJPEG: FPS máximo, ancho, calidad y modo adaptativo.
+
+    En modo adaptativo se mide cuánto tarda el cliente en consumir cada frame;
+    si tarda más que el intervalo entre frames (la cola de envío se está
+    llenando) se baja un nivel de calidad/resolución, y tras varios envíos
+    rápidos seguidos se vuelve a subir.
+    """
+
+    # (factor de ancho, factor de calidad) de cada nivel
+    LEVELS = [(1., 1.), (1., .75), (.75, .75), (.5, .6), (.5, .45), (.25, .4)]
+    RECOVER_AFTER = 30
+
+    CONTENT_TYPES = {'jpeg': 'image/jpeg', 'png': 'image/png'}
+
+    def __init__(self, kind: str = 'video', fps: Optional[float] = None, width: Optional[int] = None,
+                 quality: Optional[int] = None, adaptive: bool = False, frame_width: Optional[int] = None,
+                 fmt: str = 'jpeg'):
+        self.kind = kind
+        self.fmt = fmt
+        self.interval = 1. / fps if fps else 0.
+        self.width = width
+        self.quality = quality if quality is not None else DEFAULT_QUALITY
+        self.adaptive = adaptive
+        self.frame_width = frame_width
+        self.level = 0
+        self._fast = 0
+        self._next_time = 0.
+
+    def variant(self) -> tuple:
+        width_factor, quality_factor = self.LEVELS[self.level]
+        width = self.width or self.frame_width
+        if width is not None and width_factor < 1:
+            width = width * width_factor
+        return FrameEncoder.variant(self.kind, width, self.quality * quality_factor, self.fmt)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Empaqueta el frame para el stream: parte multipart, o tal cual en el stream binario."""
+        if self.fmt == 'bits':
+            return data
+        return (b'--frame\r\n'
+                b'Content-Type: ' + self.CONTENT_TYPES[self.fmt].encode() + b'\r\n\r\n' + data + b'\r\n')
+
+    def delay(self) -> float:
+        """Segundos a esperar antes de enviar el siguiente frame según el FPS máximo."""
+        if not self.interval:
+            return 0.
+        now = time.perf_counter()
+        wait = self._next_time - now
+        self._next_time = max(self._next_time, now) + self.interval
+        return max(0., wait)
+
+    def sent(self, elapsed: float, frame_interval: float):
+        """Registra cuánto tardó el cliente en recibir el último frame."""
+        if not self.adaptive:
+            return
+        budget = max(self.interval, frame_interval)
+        if elapsed > budget and self.level < len(self.LEVELS) - 1:
+            self.level += 1
+            self._fast = 0
+        elif elapsed < budget / 2:
+            self._fast += 1
+            if self._fast >= self.RECOVER_AFTER and self.level > 0:
+                self.level -= 1
+                self._fast = 0
+
+
+class CameraStreams(NamedTuple):
+    """Caché de frames codificados y difusor de metadata de una cámara."""
+    cam: Camera
+    encoder: FrameEncoder
+    broadcaster: MetadataBroadcaster
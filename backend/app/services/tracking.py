@@ -0,0 +1,198 @@
+import numpy as np
+from typing import List, Optional, Sequence, Union
+from app.services.processing import Overlay
+
+# Una fila por objetivo seguido: id estable, código de figura (como `TARGET_DTYPE`),
+# frames seguidos sin medición, posición (cm) y velocidad (cm/s) filtradas
+TRACK_DTYPE = np.dtype([
+    ('id', 'u4'), ('shape', 'u1'), ('missed', 'u2'),
+    ('x', 'f4'), ('y', 'f4'), ('z', 'f4'), ('vx', 'f4'), ('vy', 'f4'), ('vz', 'f4'),
+])
+NO_TRACKS = np.empty(0, TRACK_DTYPE)
+
+# Distancia de Mahalanobis² máxima para asociar una medición a un track
+# (chi² con 3 grados de libertad al 99 %)
+GATE = 11.34
+
+# Distancia mínima (cm) de una predicción: un track que se extrapola hasta
+# aquí (objetivo acercándose sin mediciones) se descarta en vez de publicar
+# una distancia imposible
+MIN_Z = 1.
+
+
+class KalmanTrack:
+    """
+    Filtro de Kalman de velocidad constante sobre (x, y, z).
+
+    Los tres ejes son independientes, así que el estado se guarda como
+    `state[eje] = (posición, velocidad)` y la covarianza como tres matrices
+    de 2x2; cada paso son unas pocas operaciones vectorizadas.
+    """
+
+    def __init__(self, track_id: int, shape: int, position, stamp: float,
+                 process_noise: float, measurement_noise: np.ndarray, velocity_noise: float = 100.):
+        self.id = track_id
+        self.shape = shape
+        self.stamp = stamp
+        self.missed = 0
+        self.q = process_noise ** 2  # varianza de la aceleración (cm/s²)²
+        self.r = measurement_noise ** 2  # varianza de la medición por eje (cm²)
+        self.state = np.zeros((3, 2))
+        self.state[:, 0] = position
+        self.cov = np.zeros((3, 2, 2))
+        self.cov[:, 0, 0] = self.r
+        self.cov[:, 1, 1] = velocity_noise ** 2
+
+    def predict(self, stamp: float):
+        """Avanza el estado hasta `stamp` (segundos, mismo reloj que al crear el track)."""
+        dt = stamp - self.stamp
+        if dt <= 0:
+            return
+        self.stamp = stamp
+        self.state[:, 0] += dt * self.state[:, 1]
+        transition = np.array([[1., dt], [0., 1.]])
+        noise = self.q * np.array([[dt**4 / 4, dt**3 / 2], [dt**3 / 2, dt**2]])
+        self.cov = transition @ self.cov @ transition.T + noise
+
+    def distance(self, position) -> float:
+        """Distancia de Mahalanobis² de una medición al estado actual."""
+        residual = np.asarray(position) - self.state[:, 0]
+        return float(np.sum(residual**2 / (self.cov[:, 0, 0] + self.r)))
+
+    def update(self, position):
+        residual = np.asarray(position) - self.state[:, 0]
+        gain = self.cov[:, :, 0] / (self.cov[:, 0, 0] + self.r)[:, None]
+        self.state += gain * residual[:, None]
+        self.cov = self.cov - gain[:, :, None] * self.cov[:, None, 0, :]
+        self.missed = 0
+
+    def row(self) -> tuple:
+        return (self.id, self.shape, min(self.missed, 65535), *self.state[:, 0], *self.state[:, 1])
+
+
+class TargetTracker:
+    """
+    Sigue las figuras de `Detection.targets` entre frames.
+
+    Cada medición se asocia al track más cercano de la misma figura
+    (distancia de Mahalanobis, asignación voraz); las que sobran abren tracks
+    nuevos. Un track sin medición sigue su predicción durante `max_missed`
+    frames antes de descartarse, así que un frame perdido ya no deja la
+    posición en 0.
+
+    `primary` es el id del track del objetivo principal: el de la mejor
+    figura de la forma buscada en el último frame que la tuvo.
+    """
+
+    def __init__(self, process_noise: float = 200., measurement_noise: Union[float, Sequence[float]] = (1., 1., 3.),
+                 max_missed: int = 5, gate: float = GATE):
+        self.process_noise = process_noise
+        self.measurement_noise = np.broadcast_to(np.asarray(measurement_noise, float), (3,)).copy()
+        self.max_missed = max_missed
+        self.gate = gate
+        self.reset()
+
+    def reset(self):
+        self.tracks: List[KalmanTrack] = []
+        self.primary: Optional[int] = None
+        self._next_id = 1
+
+    def predict(self, stamp: float) -> np.ndarray:
+        """Posición de todos los tracks en `stamp`, sin mediciones nuevas."""
+        self._advance(stamp)
+        return self.rows()
+
+    def _advance(self, stamp: float):
+        """Predice todos los tracks hasta `stamp` y descarta los que quedan en z <= `MIN_Z`."""
+        for track in self.tracks:
+            track.predict(stamp)
+        self.tracks = [track for track in self.tracks if track.state[2, 0] > MIN_Z]
+        if self.primary is not None and self.get(self.primary) is None:
+            self.primary = None
+
+    def update(self, targets: np.ndarray, stamp: float, primary_shape: int = 0) -> np.ndarray:
+        """
+        Incorpora las figuras de un frame (ordenadas por confianza) y retorna
+        los tracks vivos. `primary_shape` es el código de la figura buscada.
+        """
+        self._advance(stamp)
+
+        positions = np.stack([targets['x'], targets['y'], targets['z']], axis=1) if len(targets) else None
+        pairs = []
+        for index in range(len(targets)):
+            for track in self.tracks:
+                if track.shape == targets['shape'][index]:
+                    cost = track.distance(positions[index])
+                    if cost <= self.gate:
+                        pairs.append((cost, index, track))
+        pairs.sort(key=lambda pair: pair[0])
+
+        assigned = {}
+        used = set()
+        for _, index, track in pairs:
+            if index in assigned or track.id in used:
+                continue
+            track.update(positions[index])
+            assigned[index] = track
+            used.add(track.id)
+
+        for track in self.tracks:
+            if track.id not in used:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        for index in range(len(targets)):
+            if index not in assigned:
+                track = KalmanTrack(self._next_id, int(targets['shape'][index]), positions[index], stamp,
+                                    self.process_noise, self.measurement_noise)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[index] = track
+
+        # La primera fila de la figura buscada es la de más confianza (como en `measure`)
+        for index in range(len(targets)):
+            if targets['shape'][index] == primary_shape:
+                self.primary = assigned[index].id
+                break
+        else:
+            if self.primary is not None and self.get(self.primary) is None:
+                self.primary = None
+        return self.rows()
+
+    def get(self, track_id: Optional[int]) -> Optional[KalmanTrack]:
+        for track in self.tracks:
+            if track.id == track_id:
+                return track
+        return None
+
+    def rows(self) -> np.ndarray:
+        if not self.tracks:
+            return NO_TRACKS
+        return np.array([track.row() for track in self.tracks], TRACK_DTYPE)
+
+    def metadata(self, metadata: dict) -> dict:
+        """
+        `metadata` con la posición filtrada del objetivo principal, su
+        velocidad y los frames que lleva sin medición. Sin objetivo, todo en 0.
+        """
+        track = self.get(self.primary)
+        if track is None:
+            return {**metadata, 'x_dobj': .0, 'y_dobj': .0, 'z_dobj': .0, 'dobj': .0,
+                    'vx': .0, 'vy': .0, 'vz': .0, 'missed': 0}
+        (x, vx), (y, vy), (z, vz) = track.state.tolist()
+        return {**metadata, 'x_dobj': x, 'y_dobj': y, 'z_dobj': z, 'dobj': z,
+                'vx': vx, 'vy': vy, 'vz': vz, 'missed': track.missed}
+
+
+def track_overlays(tracks: np.ndarray, img_size, focal_lenght: float, only_missed: bool = False) -> List[Overlay]:
+    """Centro proyectado (px) de los tracks predichos, inverso de `position`."""
+    overlays: List[Overlay] = []
+    width = img_size[1]
+    heigth = img_size[0]
+    for row in tracks:
+        if (only_missed and not row['missed']) or row['z'] <= 0:
+            continue
+        factor = focal_lenght / row['z']
+        overlays.append(('circle', (int(width / 2 + row['x'] * factor), int(heigth / 2 - row['y'] * factor)),
+                         (255, 0, 0)))
+    return overlays
@@ -2,7 +2,10 @@ import serial
 import json
 import threading
 import time
+from app.services import protocol
 from app.services.camera import Camera
+from app.services.processing import NO_TARGETS, shape_code
+from app.utils.config import ConfigStore
 
 cam = Camera()
 
@@ -27,50 +30,169 @@ class UART:
             self.thread = None
             self.rx_thread = None
             self.tx_thead = None
-            self.receiving_data_ready = False  # Indica si se recibió "RECEIVING DATA"
+            self.receiving_data_ready = False  # Indica si se recibió "RECEIVING DATA" (o READY)
+            self.version = protocol.LEGACY_VERSION  # versión negociada con HELLO (0 = texto)
+            self.decoder = protocol.FrameDecoder()
+            self.seq = 0  # número de secuencia del próximo mensaje DATA
+            settings = ConfigStore().settings
+            self.targets = settings.uart_targets  # figuras extra por mensaje
+            # Envío por evento: cada resultado nuevo de la cámara, a lo sumo `max_rate` por segundo
+            self.max_rate = settings.uart_max_rate
+            # Sin handshake por mensaje (con el texto, después del primer "RECEIVING DATA")
+            self.prefer_streaming = settings.uart_streaming
+            self.streaming = False  # modo efectivo, se decide al negociar
+            self._ready = threading.Event()  # despierta al hilo de envío cuando el ESP32 pide datos
+
+            # Contadores para `/metrics`
+            self.tx_count = 0
+            self.tx_bytes = 0
+            self.tx_errors = 0
+            self.tx_dropped = 0  # resultados que no se enviaron por llegar otro más nuevo
+            self.rx_count = 0
+            self.rx_errors = 0
             self._initialized = True
 
     
-    def send_data(self, data):
+    # Bytes pendientes de salida a partir de los cuales se descartan resultados
+    MAX_OUT_BYTES = 256
+    # Campos de `data` que van en el mensaje, en orden (el tracker agrega otros que no se envían)
+    METADATA_FIELDS = ['x_dobj', 'y_dobj', 'z_dobj', 'dobj', 'area']
+    # Campos de cada figura extra: código de figura (1 cuadrilátero, 2 triángulo, 3 círculo), confianza, x, y, z
+    TARGET_FIELDS = ['shape', 'confidence', 'x', 'y', 'z']
+
+    def send_data(self, data, targets=None, stamp=0.):
         """
-        Envía datos al puerto UART del formato JSON.
+        Envía el objetivo principal (`data`, como `Camera.metadata`) con el
+        protocolo negociado: mensaje binario de `protocol` o, con la versión 0,
+        la línea de texto `;` de siempre.
+
+        Si `targets` (arreglo de `Camera.targets`) y `self.targets > 0`, después
+        del objetivo principal van las primeras figuras. `stamp` es el instante
+        de captura del frame. Retorna `True` si se envió.
         """
         if self.serial_port.is_open and self.receiving_data_ready and (data['dobj'] > 0):
-            serial_data = ';'.join([str(v) for v in data.values()]) + '\n'
-            self.serial_port.write(serial_data.encode('utf-8'))
-            print(f"Sended: {serial_data}")
-            self.receiving_data_ready = False
-
+            if self.version >= 1:
+                records = protocol.make_records(data, NO_TARGETS if targets is None else targets,
+                                                shape_code(cam.target_shape), self.targets)
+                serial_data = protocol.encode_data(self.seq, protocol.stamp_ms(stamp), records)
+            else:
+                values = [str(data[key]) for key in self.METADATA_FIELDS]
+                if self.targets and targets is not None:
+                    for row in targets[:self.targets][self.TARGET_FIELDS].tolist():
+                        values.extend(format(v, '.6g') for v in row)
+                serial_data = (';'.join(values) + '\n').encode('utf-8')
+            try:
+                self.tx_bytes += self.serial_port.write(serial_data) or 0
+            except Exception as e:
+                self.tx_errors += 1
+                print(f"Error al enviar datos: {e}")
+                return False
+            self.tx_count += 1
+            if self.version == protocol.LEGACY_VERSION and not self.streaming:
+                print(f"Sended: {serial_data.decode('utf-8')}")
+            self.seq = (self.seq + 1) & 0xFFFF
+            if not self.streaming:
+                self.receiving_data_ready = False
+                self._ready.clear()
+            return True
+        return False
 
     def receive_data(self):
+        """Lee lo que haya en el puerto y atiende la negociación y los avisos del ESP32."""
         if self.serial_port.is_open:
+            raw_data = b''
             try:
-                raw_data = self.serial_port.readline()
-                data = raw_data.decode('utf-8').strip()
-                if data:
-                    print(f"Recibido: {data}")
-                    # Verificar si el mensaje recibido es "RECEIVING DATA"
-
-                    if not self.receiving_data_ready:
-                        if data == "RECEIVING DATA":
-                            self.receiving_data_ready = True
-                            print("ESP32 listo para recibir datos.")
-                return data
+                raw_data = self.serial_port.read(self.serial_port.in_waiting or 1)
+                errors = self.decoder.errors
+                messages = self.decoder.feed(raw_data)
+                self.rx_errors += self.decoder.errors - errors
+                for message in messages:
+                    self.rx_count += 1
+                    if isinstance(message, str):
+                        print(f"Recibido: {message}")
+                        # Firmware sin protocolo binario: se sigue con texto
+                        if message == protocol.LEGACY_HANDSHAKE:
+                            if self.version != protocol.LEGACY_VERSION:
+                                print("ESP32 sin protocolo binario, se usa texto.")
+                            self.version = protocol.LEGACY_VERSION
+                            self.streaming = self.prefer_streaming
+                            self._set_ready()
+                    elif message.kind == protocol.HELLO:
+                        self._accept(message)
+                    elif message.kind == protocol.READY:
+                        self._set_ready()
+                return messages
             except Exception as e:
+                self.rx_errors += 1
                 print(f"Error al recibir datos: {e}, data: {raw_data}")
                 return None
 
+    def _accept(self, hello: protocol.Frame):
+        """Responde HELLO con la versión más alta que entienden ambos lados."""
+        offered = hello.payload[0] if hello.payload else hello.version
+        requested = hello.payload[1] if len(hello.payload) > 1 else 0
+        version = protocol.negotiate(offered)
+        if version is None:
+            print(f"ESP32 ofrece la versión {offered}, no soportada.")
+            return
+        streaming = self.prefer_streaming or bool(requested & protocol.STREAM)
+        flags = protocol.STREAM if streaming else 0
+        try:
+            self.tx_bytes += self.serial_port.write(
+                protocol.encode_frame(protocol.ACCEPT, payload=bytes([version, flags]), version=version)) or 0
+        except Exception as e:
+            self.tx_errors += 1
+            print(f"Error al enviar datos: {e}")
+            return
+        self.version = version
+        self.seq = 0
+        self.streaming = streaming
+        if streaming:
+            self._set_ready()
+        else:
+            self.receiving_data_ready = False
+            self._ready.clear()
+        print(f"Protocolo UART binario v{version} negociado{' (streaming)' if streaming else ''}.")
+
+    def _set_ready(self):
+        self.receiving_data_ready = True
+        self._ready.set()
+
     def _rx_task(self):
+        # `read` espera hasta el timeout del puerto si no llega nada
         while self.running:
             self.receive_data()
-            time.sleep(0.1)
 
     def _tx_task(self):
+        """
+        Envía cada resultado nuevo apenas la cámara lo publica (y el ESP32 está
+        listo), a lo sumo `max_rate` veces por segundo. Si mientras tanto llegan
+        varios, sólo se envía el último y los anteriores se cuentan en
+        `tx_dropped`; nunca se repite un resultado ya enviado.
+        """
+        interval = 1 / self.max_rate if self.max_rate > 0 else 0.
+        last_id = cam.notifier.seq
+        last_sent = 0.
         while self.running:
-            metadata = cam.metadata
-            if metadata:
-                self.send_data(metadata)  
-            time.sleep(0.1)
+            if not self._ready.wait(timeout=0.5):
+                continue
+            frame_id = cam.notifier.wait(last_id, timeout=0.5)
+            if frame_id == last_id:
+                continue
+            wait = last_sent + interval - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+                frame_id = cam.notifier.seq
+            # El puerto todavía no vacía lo anterior: se descarta este resultado y se espera el próximo
+            if self.serial_port.out_waiting > self.MAX_OUT_BYTES:
+                self.tx_dropped += frame_id - last_id
+                last_id = frame_id
+                continue
+            self.tx_dropped += frame_id - last_id - 1
+            last_id = frame_id
+            metadata, targets, stamp = cam.results
+            if metadata and self.send_data(metadata, targets, stamp):
+                last_sent = time.perf_counter()
 
     def start(self):
         """
@@ -99,6 +221,7 @@ class UART:
         """
         if self.running:
             self.running = False
+            self._ready.set()
             if self.rx_thread and self.rx_thread.is_alive():
                 self.rx_thread.join()
             if self.tx_thread and self.tx_thread.is_alive():
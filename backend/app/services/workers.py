@@ -0,0 +1,228 @@
+import heapq
+import multiprocessing as mp
+import queue
+import time
+import numpy as np
+from multiprocessing.shared_memory import SharedMemory
+from threading import Thread, Lock
+from typing import Callable, Dict, List, Optional, Tuple
+from app.services.processing import Detection, DetectionParams, detect
+
+
+def _worker(frame_names: List[str], mask_names: List[str], tasks, results):
+    """Proceso de detección: lee el frame del slot en memoria compartida y escribe ahí la máscara."""
+    frame_shms = [SharedMemory(name=name) for name in frame_names]
+    mask_shms = [SharedMemory(name=name) for name in mask_names]
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot, shape, params = task
+            frame = np.ndarray(shape, np.uint8, buffer=frame_shms[slot].buf)
+            try:
+                detection = detect(frame, params)
+                np.ndarray(shape[:2], np.uint8, buffer=mask_shms[slot].buf)[...] = detection.mask
+                result = (detection.metadata, detection.overlays, detection.hit, detection.targets, detection.polygon)
+            except Exception as e:
+                print(f"Error en el worker de detección: {e}")
+                result = None
+            del frame
+            results.put((seq, slot, result))
+    finally:
+        for shm in frame_shms + mask_shms:
+            shm.close()
+
+
+class DetectionPool:
+    """
+    Ejecuta la detección en `workers` procesos sobre slots de memoria compartida.
+
+    Los frames se copian una sola vez al slot (sin pickle) y los resultados se
+    reordenan por número de secuencia antes de entregarse a `on_result`. Los
+    slots se vuelven a reservar sólo si llega un frame más grande que su capacidad.
+
+    Si un worker muere (falta de memoria, un fallo dentro de OpenCV) los
+    frames en proceso se dan por perdidos, se liberan sus slots y se relanzan
+    todos los procesos con colas nuevas (un proceso que muere con el lock de
+    una cola tomado la deja inutilizable). Tras `max_restarts` reinicios
+    `failed` queda en `True` y quien usa el pool debe detectar por su cuenta
+    (ver `Camera._dispatch_loop`).
+    """
+
+    def __init__(self, workers: int, on_result: Callable[[np.ndarray, Detection, float], None],
+                 slots: Optional[int] = None, max_restarts: int = 5, check_interval: float = 0.5):
+        self.workers = max(1, workers)
+        self.slots = slots or self.workers * 2
+        self.on_result = on_result
+        self.max_restarts = max_restarts
+        self.check_interval = check_interval
+        self.capacity = 0
+        self.dropped = 0
+        self.lost = 0  # frames perdidos porque un worker murió
+        self.restarts = 0
+        self.failed = False
+        self._stopping = False
+        self._inflight: Dict[int, int] = {}  # seq -> slot de los frames enviados sin resultado entregado
+        self._ctx = mp.get_context('spawn')
+        self._procs = []
+        self._frame_shms: List[SharedMemory] = []
+        self._mask_shms: List[SharedMemory] = []
+        self._free = queue.Queue()
+        self._seq = 0
+        self._lock = Lock()
+        self._collector = None
+
+    def start(self, capacity: int):
+        """Reserva `slots` bloques de `capacity` bytes y lanza los procesos."""
+        self.capacity = capacity
+        self._frame_shms = [SharedMemory(create=True, size=capacity) for _ in range(self.slots)]
+        self._mask_shms = [SharedMemory(create=True, size=capacity) for _ in range(self.slots)]
+        self._originals: List[Optional[Tuple[np.ndarray, float]]] = [None] * self.slots
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+
+        self._inflight = {}
+        self._stopping = False
+        try:
+            self._spawn()
+        except Exception:
+            self.stop()
+            raise
+
+        self._seq = 0
+        self._collector = Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _spawn(self):
+        """Crea las colas y lanza los procesos."""
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._procs = [
+            self._ctx.Process(
+                target=_worker,
+                args=([s.name for s in self._frame_shms], [s.name for s in self._mask_shms],
+                      self._tasks, self._results),
+                daemon=True,
+            )
+            for _ in range(self.workers)
+        ]
+        for proc in self._procs:
+            proc.start()
+
+    def submit(self, frame: np.ndarray, params: DetectionParams, stamp: float = 0.) -> bool:
+        """
+        Copia el frame a un slot libre y lo encola. Si todos los slots están
+        ocupados el frame se descarta y se retorna `False`. `stamp` (instante
+        de captura) se entrega tal cual a `on_result`.
+        """
+        if frame.nbytes > self.capacity:
+            self.stop()
+            self.start(frame.nbytes)
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        self._originals[slot] = (frame, stamp)
+        np.copyto(np.ndarray(frame.shape, np.uint8, buffer=self._frame_shms[slot].buf), frame)
+        with self._lock:
+            seq = self._seq
+            self._seq += 1
+            self._inflight[seq] = slot
+            self._tasks.put((seq, slot, frame.shape, params))
+        return True
+
+    def _collect(self):
+        """Recibe resultados de los workers y los entrega en orden de captura."""
+        pending = []
+        next_seq = 0
+        next_check = time.monotonic() + self.check_interval
+        while True:
+            try:
+                item = self._results.get(timeout=self.check_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                heapq.heappush(pending, item)
+
+            # Revisar los workers aunque sigan llegando resultados de los demás
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.check_interval
+                restarted_at = self._check_workers()
+                if restarted_at is not None:
+                    pending = []
+                    next_seq = restarted_at
+                    continue
+
+            while pending and pending[0][0] == next_seq:
+                _, slot, result = heapq.heappop(pending)
+                with self._lock:
+                    self._inflight.pop(next_seq, None)
+                next_seq += 1
+                # Los workers no modifican el frame: se entrega el original
+                frame, stamp = self._originals[slot]
+                mask = np.ndarray(frame.shape[:2], np.uint8, buffer=self._mask_shms[slot].buf).copy()
+                self._originals[slot] = None
+                self._free.put(slot)
+                if result is not None:
+                    self.on_result(frame, Detection(mask, *result), stamp)
+
+    def _check_workers(self) -> Optional[int]:
+        """
+        Si algún worker murió, descarta los frames en proceso, relanza el pool
+        y retorna la secuencia desde la que se sigue; `None` si todos viven.
+        """
+        with self._lock:
+            dead = [proc for proc in self._procs if not proc.is_alive()]
+            if self._stopping or not dead:
+                return None
+            for proc in dead:
+                print(f"Worker de detección {proc.pid} terminó (código {proc.exitcode}).")
+            for proc in self._procs:
+                if proc.is_alive():
+                    proc.terminate()
+                proc.join(timeout=2)
+
+            # Los frames enviados no van a llegar: se liberan sus slots
+            for slot in self._inflight.values():
+                self._originals[slot] = None
+                self._free.put(slot)
+            self.lost += len(self._inflight)
+            self._inflight = {}
+
+            if self.restarts >= self.max_restarts:
+                print("Demasiados reinicios de workers: se detecta sin procesos.")
+                self.failed = True
+                self._procs = []
+                return self._seq
+            self.restarts += 1
+            self._spawn()
+            return self._seq
+
+    def stop(self):
+        """Detiene los procesos y libera la memoria compartida."""
+        if not self.capacity:
+            return
+        with self._lock:
+            self._stopping = True
+        started = [proc for proc in self._procs if proc.pid is not None]
+        for _ in started:
+            self._tasks.put(None)
+        for proc in started:
+            proc.join(timeout=2)
+            if proc.is_alive():
+                proc.terminate()
+        self._results.put(None)
+        if self._collector is not None:
+            self._collector.join()
+        self._procs = []
+        for shm in self._frame_shms + self._mask_shms:
+            shm.close()
+            shm.unlink()
+        self._frame_shms = []
+        self._mask_shms = []
+        self.capacity = 0
@@ -0,0 +1,191 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from threading import Condition, Event, Lock, Thread
+from typing import Optional
+from app.models.settings import Settings
+
+# Ruta absoluta: no depende del directorio desde el que se lance el servidor
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.json')
+
+
+class ConfigStore:
+    """
+    Configuración del proceso cargada una sola vez en memoria.
+
+    `settings` nunca lee el disco. Con `start_watching` un hilo revisa el mtime
+    del archivo y lo recarga si cambió fuera del proceso. Las escrituras son
+    atómicas: archivo temporal en el mismo directorio y `os.replace`.
+
+    `update_later` aplica el cambio en memoria al instante y deja la escritura
+    a un hilo que espera `DEBOUNCE` segundos sin cambios nuevos: una ráfaga de
+    cambios (p. ej. sliders de calibración) termina en una sola escritura.
+    `flush` escribe lo pendiente de inmediato (se llama al cerrar la app).
+    """
+
+    DEBOUNCE = 0.5
+
+    _instance = None  # Variable de clase para el patrón Singleton
+    _lock = Lock()  # Lock para evitar problemas de concurrencia
+
+    def __new__(cls, *args, **kwargs):
+        """Singleton: Asegura que solo haya una instancia de la clase."""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, path: str = CONFIG_PATH):
+        if not hasattr(self, "_initialized"):
+            self.path = path
+            self._write_lock = Lock()
+            self._stop = Event()
+            self._watcher: Optional[Thread] = None
+            self._mtime = None
+            self._settings = self._load()
+
+            # Escritura diferida
+            self._dirty = False
+            self._deadline = 0.
+            self._pending = Condition()
+            self._writer: Optional[Thread] = None
+            self._initialized = True
+
+    @property
+    def settings(self) -> Settings:
+        """Configuración actual; no se debe modificar (usar `update`)."""
+        return self._settings
+
+    def as_dict(self) -> dict:
+        return self._settings.model_dump(exclude_unset=True)
+
+    def _load(self) -> Settings:
+        with open(self.path, 'r') as file:
+            self._mtime = os.fstat(file.fileno()).st_mtime_ns
+            return Settings.model_validate(json.load(file))
+
+    def reload(self) -> bool:
+        """Recarga el archivo si su mtime cambió. Retorna `True` si se recargó."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._mtime or self._dirty:
+            return False  # sin cambios, o hay cambios propios pendientes que tienen prioridad
+        with self._write_lock:
+            if mtime == self._mtime or self._dirty:
+                return False  # era una escritura propia que terminó mientras tanto
+            try:
+                self._settings = self._load()
+            except (OSError, ValueError) as e:
+                # Archivo a medio escribir por otro programa: se reintenta en la siguiente revisión
+                print(f"No se pudo recargar la configuración: {e}")
+                return False
+        return True
+
+    def update(self, **changes) -> Settings:
+        """Aplica los cambios en memoria y los guarda en disco de forma atómica."""
+        with self._write_lock:
+            settings = Settings.model_validate({**self.as_dict(), **changes})
+            self._write(settings)
+            self._settings = settings
+            self._dirty = False
+        return settings
+
+    def update_later(self, **changes) -> Settings:
+        """Aplica los cambios en memoria y agenda la escritura tras un periodo sin cambios."""
+        with self._write_lock:
+            settings = Settings.model_validate({**self.as_dict(), **changes})
+            self._settings = settings
+            self._dirty = True
+        with self._pending:
+            self._deadline = time.monotonic() + self.DEBOUNCE
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = Thread(target=self._write_behind, daemon=True)
+                self._writer.start()
+            self._pending.notify()
+        return settings
+
+    def update_camera_later(self, cam_id: str, **changes) -> Settings:
+        """Como `update_later` pero sobre la entrada de `cameras` de esa cámara (si hay varias)."""
+        cameras = self._settings.cameras
+        if not cameras:
+            return self.update_later(**changes)
+        cameras = [{**entry, **changes} if str(entry['id']) == cam_id else entry for entry in cameras]
+        return self.update_later(cameras=cameras)
+
+    def flush(self):
+        """Escribe de inmediato los cambios pendientes de `update_later`."""
+        with self._write_lock:
+            if self._dirty:
+                self._write(self._settings)
+                self._dirty = False
+
+    def _write_behind(self):
+        """Espera a que pase `DEBOUNCE` sin cambios y escribe; termina cuando no queda nada pendiente."""
+        while True:
+            with self._pending:
+                wait = self._deadline - time.monotonic()
+                if wait > 0:
+                    self._pending.wait(wait)
+                    continue
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"No se pudo guardar la configuración: {e}")
+                with self._pending:
+                    self._deadline = time.monotonic() + self.DEBOUNCE  # reintentar más tarde
+            with self._pending:
+                if self._deadline <= time.monotonic() and not self._dirty:
+                    self._writer = None
+                    return
+
+    def replace(self, data: dict) -> Settings:
+        """Reemplaza toda la configuración (como el antiguo `set_json_settings`)."""
+        with self._write_lock:
+            settings = Settings.model_validate(data)
+            self._write(settings)
+            self._settings = settings
+            self._dirty = False
+        return settings
+
+    def _write(self, settings: Settings):
+        directory = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(settings.model_dump(exclude_unset=True), file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            # `mkstemp` crea el archivo con 0600: se conservan los permisos del original
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, tmp_path)
+            else:
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        # La escritura propia no debe provocar una recarga
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def start_watching(self, interval: float = 1.):
+        """Revisa el mtime del archivo cada `interval` segundos en un hilo aparte."""
+        if self._watcher is None or not self._watcher.is_alive():
+            self._stop.clear()
+            self._watcher = Thread(target=self._watch, args=(interval,), daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None and self._watcher.is_alive():
+            self._watcher.join()
+        self._watcher = None
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            if self.reload():
+                print("Configuración recargada desde disco.")
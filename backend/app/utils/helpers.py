@@ -1,10 +1,9 @@
-import json
+from app.utils.config import ConfigStore
 
 def get_json_settings():
-    with open('app/config.json', 'r') as file:
-        settings = json.load(file)
-    return settings
+    """Copia de la configuración en memoria (ya no lee `app/config.json` en cada llamada)."""
+    return ConfigStore().as_dict()
 
 def set_json_settings(settings: dict):
-    with open('app/config.json', 'w') as file:
-        json.dump(settings, file, indent=4)
\ No newline at end of file
+    """Reemplaza la configuración y la guarda de forma atómica."""
+    ConfigStore().replace(settings)
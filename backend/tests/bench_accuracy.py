@@ -0,0 +1,54 @@
+"""
+Precisión y velocidad de la detección sobre escenas sintéticas con distancia
+conocida (`app/services/scenes.py`).
+
+Uso (desde `backend/`):
+    python -m tests.bench_accuracy
+    python -m tests.bench_accuracy --size 1280x720 --noise 8 --blur 5 --clutter 10 --lighting .3
+"""
+import argparse
+import time
+import numpy as np
+from app.services.processing import DetectionParams, detect
+from app.services.scenes import SHAPES, SceneGenerator
+
+DISTANCES = (40., 60., 80., 100., 150., 200., 250.)
+OFFSETS = ((0., 0.), (10., 5.), (-15., -8.))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', default='640x480')
+    parser.add_argument('--focal-lenght', type=float, default=600.)
+    parser.add_argument('--noise', type=float, default=0.)
+    parser.add_argument('--blur', type=int, default=0)
+    parser.add_argument('--clutter', type=int, default=0)
+    parser.add_argument('--lighting', type=float, default=0.)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.split('x'))
+    generator = SceneGenerator(size, args.focal_lenght, args.noise, args.blur, args.clutter, args.lighting, args.seed)
+    for name, shape in SHAPES.items():
+        params = DetectionParams(np.array([22, 51, 151]), np.array([90, 255, 255]), np.ones((5, 5), np.uint8),
+                                 shape, args.focal_lenght)
+        errors, xy_errors, elapsed, total = [], [], 0., 0
+        for scene in generator.sweep([name], DISTANCES, OFFSETS):
+            start = time.perf_counter()
+            metadata = detect(scene.frame, params).metadata
+            elapsed += time.perf_counter() - start
+            total += 1
+            if metadata['dobj'] > 0:
+                errors.append((metadata['dobj'] - scene.truth['dobj']) / scene.truth['dobj'])
+                xy_errors.append(np.hypot(metadata['x_dobj'] - scene.truth['x_dobj'],
+                                          metadata['y_dobj'] - scene.truth['y_dobj']))
+        errors = np.array(errors) * 100
+        print(f"{name:<14} detectados {len(errors)}/{total}  "
+              f"error distancia medio {errors.mean() if len(errors) else float('nan'):+6.2f}% "
+              f"(máx {np.abs(errors).max() if len(errors) else float('nan'):5.2f}%)  "
+              f"error XY medio {np.mean(xy_errors) if xy_errors else float('nan'):5.2f} cm  "
+              f"{total / elapsed:7.1f} fps")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Compara bytes por frame y tiempo de codificación de la máscara: JPEG (camino
+anterior) contra PNG de 1 bit y bits comprimidos (`/detection/mask-bits`).
+
+Uso (desde `backend/`):
+    python -m tests.bench_mask_codec
+"""
+import time
+import cv2
+import numpy as np
+from app.models.shapes import ShapeType
+from app.services.mask_codec import encode_mask, pack_mask, unpack_mask
+from app.services.processing import DetectionParams, build_mask
+
+IMAGES = ['tests/imgs/edges.jpg', 'tests/imgs/image.png', 'tests/imgs/shape.jpg']
+RANGES = [([22, 51, 151], [90, 255, 255]), ([0, 0, 100], [180, 80, 255]), ([0, 60, 0], [180, 255, 255])]
+RESOLUTIONS = [(640, 480), (1280, 720)]
+REPEAT = 20
+
+ENCODERS = {
+    'jpeg': lambda mask: cv2.imencode('.jpg', mask)[1].tobytes(),
+    'png': lambda mask: encode_mask(mask, 'png'),
+    'bits': pack_mask,
+}
+
+
+def masks(size):
+    for lower, upper in RANGES:
+        params = DetectionParams(np.array(lower), np.array(upper), np.ones((5, 5), np.uint8),
+                                 ShapeType.QUADRILATERAL.value, 600)
+        for path in IMAGES:
+            yield build_mask(cv2.resize(cv2.imread(path), size), params)
+
+
+def main():
+    for size in RESOLUTIONS:
+        samples = list(masks(size))
+        for mask in samples:
+            assert np.array_equal(unpack_mask(pack_mask(mask)), mask)
+
+        for name, encode in ENCODERS.items():
+            sizes = []
+            start = time.perf_counter()
+            for _ in range(REPEAT):
+                sizes = [len(encode(mask)) for mask in samples]
+            elapsed = (time.perf_counter() - start) / (REPEAT * len(samples)) * 1000
+            print(f"{size[0]}x{size[1]} {name:>4}: {np.mean(sizes):9.0f} bytes/frame, {elapsed:.2f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compara el camino `cvtColor` + `inRange` contra una tabla BGR -> máscara
+precalculada (`MaskLut`).
+
+La tabla no se usa en la cámara: en x86 con la imagen de prueba la versión
+exacta (`bits=8`) queda entre 0.8x y 1.1x de `cvtColor` + `inRange` (la
+tabla de 16 MB no cabe en caché) y las cuantizadas son entre 1.5x y 2x más
+lentas por la pasada extra.
+Se conserva para repetir la medición en otra plataforma.
+
+Uso (desde `backend/`):
+    python -m tests.bench_mask_lut
+"""
+import time
+import cv2
+import numpy as np
+
+LOWER = np.array([22, 51, 151])
+UPPER = np.array([90, 255, 255])
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+REPEAT = 50
+
+
+class MaskLut:
+    """
+    Tabla BGR -> máscara para un rango HSV.
+
+    El índice de cada píxel es su valor BGRA visto como `uint32` sin el alfa
+    (`b | g << 8 | r << 16`): aplicarla es `cvtColor` a BGRA, una máscara de
+    bits y `take`. Con `bits=8` la tabla tiene 2^24 entradas (16 MB) y es
+    exacta; con menos bits cada canal se cuantiza antes con `cv2.LUT`, a cambio
+    de algo de error en los bordes del rango.
+    """
+
+    def __init__(self, bits: int = 8):
+        if not 1 <= bits <= 8:
+            raise ValueError("bits debe estar entre 1 y 8")
+        self.bits = bits
+        shift = 8 - bits
+        self.quantize = (np.arange(256) >> shift).astype(np.uint8) if shift else None
+        self.table = None
+        self._bgra = None
+
+    def build(self, lower: np.ndarray, upper: np.ndarray):
+        """Evalúa `cvtColor` + `inRange` una vez por cada color representable."""
+        levels = 1 << self.bits
+        step = 256 // levels
+        values = (np.arange(levels, dtype=np.uint16) * step + step // 2).astype(np.uint8)
+        r, g, b = np.meshgrid(values, values, values, indexing='ij')
+        colors = np.stack((b, g, r), axis=-1).reshape(levels * levels, levels, 3)
+        mask = cv2.inRange(cv2.cvtColor(colors, cv2.COLOR_BGR2HSV), lower, upper).reshape(levels, levels, levels)
+        if levels == 256:
+            self.table = mask.reshape(-1)
+        else:
+            table = np.zeros((levels, 256, 256), np.uint8)
+            table[:, :levels, :levels] = mask
+            self.table = table.reshape(-1)
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """Aplica la tabla a un frame BGR y retorna la máscara (0/255)."""
+        if self._bgra is None or self._bgra.shape[:2] != frame.shape[:2]:
+            self._bgra = np.empty((*frame.shape[:2], 4), np.uint8)
+        if self.quantize is not None:
+            frame = cv2.LUT(frame, self.quantize)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=self._bgra)
+        idx = self._bgra.view(np.uint32)[..., 0]
+        np.bitwise_and(idx, 0xFFFFFF, out=idx)
+        return self.table.take(idx, mode='clip')
+
+
+def timeit(fn, repeat=REPEAT):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    image = cv2.imread('tests/imgs/shape.jpg')
+
+    luts = {}
+    for bits in (5, 6, 8):
+        start = time.perf_counter()
+        luts[bits] = MaskLut(bits)
+        luts[bits].build(LOWER, UPPER)
+        print(f"build bits={bits}: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for size in RESOLUTIONS:
+        frame = cv2.resize(image, size)
+        reference = cv2.inRange(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV), LOWER, UPPER)
+        base = timeit(lambda: cv2.inRange(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV), LOWER, UPPER))
+        print(f"{size[0]}x{size[1]} cvtColor+inRange: {base:.2f} ms")
+        for bits, lut in luts.items():
+            elapsed = timeit(lambda: lut.apply(frame))
+            error = np.count_nonzero(lut.apply(frame) != reference) / reference.size
+            print(f"{size[0]}x{size[1]} lut bits={bits}: {elapsed:.2f} ms ({base / elapsed:.2f}x), error {error:.4%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark sin ventanas del pipeline de detección.
+
+Corre las mismas funciones que usa `Camera` (`detect`, `RoiTracker`, pirámide,
+filtro de candidatos y `FlowTracker`) sobre frames grabados o sintéticos, a varias
+resoluciones y con distinta cantidad de contornos por frame. Reporta FPS,
+tiempo por etapa (`app/services/profiler.py`) y memoria asignada por frame, y
+guarda todo en JSON para comparar entre commits.
+
+Uso (desde `backend/`):
+    python -m tests.bench_pipeline
+    python -m tests.bench_pipeline --resolutions 640x480 --densities 0 50 --modes full roi
+    python -m tests.bench_pipeline --images tests/imgs --output antes.json
+    python -m tests.bench_pipeline --compare antes.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from app.models.shapes import ShapeType
+from app.services.processing import DetectionParams, FlowTracker, RoiTracker, detect
+from app.services.profiler import profiler
+from app.services.scenes import TARGET_COLOR
+from app.services.sources import ImageDirSource, VideoFileSource
+
+LOWER = np.array([22, 51, 151])
+UPPER = np.array([90, 255, 255])
+KERNEL = np.ones((5, 5), np.uint8)
+FOCAL_LENGHT = 600
+
+RESOLUTIONS = ['320x240', '640x480', '1280x720', '1920x1080']
+DENSITIES = [0, 10, 50]
+MODES = ['full', 'roi', 'pyramid', 'candidates', 'flow']
+
+# Colores BGR del desorden: la mitad dentro del rango HSV por defecto
+CLUTTER_COLORS = [(40, 200, 120), (90, 230, 200), (200, 60, 60), (40, 40, 200)]
+
+
+def base_params(**kwargs) -> DetectionParams:
+    return DetectionParams(LOWER, UPPER, KERNEL, ShapeType.QUADRILATERAL.value, FOCAL_LENGHT, **kwargs)
+
+
+def synthetic_frames(size, density: int, count: int, seed: int = 0) -> List[np.ndarray]:
+    """
+    Frames con un cuadrado objetivo que se desplaza y `density` manchas de
+    relleno (la mitad dentro del rango HSV, así que generan contornos).
+    """
+    width, height = size
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 40, (height, width, 3), np.uint8)
+    clutter = [(tuple(int(v) for v in rng.integers(0, (width, height))),
+                int(rng.integers(3, max(4, min(width, height) // 20))),
+                CLUTTER_COLORS[i % len(CLUTTER_COLORS)]) for i in range(density)]
+
+    side = max(24, min(width, height) // 6)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        for center, radius, color in clutter:
+            cv2.circle(frame, center, radius, color, -1)
+        x = int((width - side) * (0.5 + 0.3 * np.sin(i / 10)))
+        y = (height - side) // 2
+        cv2.rectangle(frame, (x, y), (x + side, y + side), TARGET_COLOR, -1)
+        frames.append(frame)
+    return frames
+
+
+def recorded_frames(path: str, size, count: int) -> List[np.ndarray]:
+    """Frames de un video o de un directorio de imágenes, escalados a `size`."""
+    if path.lower().endswith(('.mp4', '.avi', '.mkv', '.mov')):
+        source = VideoFileSource(path, realtime=False, loop=True)
+    else:
+        source = ImageDirSource(path, realtime=False, loop=True)
+    frames = []
+    while len(frames) < count:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, size))
+    source.release()
+    return frames
+
+
+def runner(mode: str) -> Callable[[np.ndarray], object]:
+    if mode == 'roi':
+        tracker = RoiTracker()
+        params = base_params()
+        return lambda frame: tracker.detect(frame, params)
+    if mode == 'flow':
+        flow = FlowTracker()
+        params = base_params()
+        return lambda frame: flow.detect(frame, params)
+    if mode == 'pyramid':
+        params = base_params(pyramid_scale=.5)
+    elif mode == 'candidates':
+        params = base_params(candidate_filter=True)
+    else:
+        params = base_params()
+    return lambda frame: detect(frame, params)
+
+
+def run_case(mode: str, frames: List[np.ndarray], repeat: int) -> dict:
+    # Tiempo total sin instrumentación
+    process = runner(mode)
+    process(frames[0])
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            hits += process(frame).hit is not None
+    elapsed = time.perf_counter() - start
+    total = repeat * len(frames)
+
+    # Tiempo por etapa, en una pasada aparte con el profiler activo
+    process = runner(mode)
+    profiler.reset()
+    profiler.enabled = True
+    for frame in frames:
+        process(frame)
+    profiler.enabled = False
+    stages = {name: stats for name, stats in profiler.summary()['stages'].items() if stats}
+
+    # Memoria: pico asignado durante cada frame (tracemalloc también ve los buffers de NumPy)
+    process = runner(mode)
+    tracemalloc.start()
+    peaks = []
+    for frame in frames:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        process(frame)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    return {
+        'fps': total / elapsed,
+        'ms_per_frame': elapsed / total * 1000,
+        'hit_rate': hits / total,
+        'stages_ms': {name: {key: stats[key] for key in ('mean', 'p50', 'p95', 'p99')} for name, stats in stages.items()},
+        'alloc_peak_kib': float(np.mean(peaks)) / 1024,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, dict], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['cases']
+    print(f"\nComparación contra {baseline_path}:")
+    for key, case in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        change = (case['ms_per_frame'] / old['ms_per_frame'] - 1) * 100
+        print(f"  {key:<36} {old['ms_per_frame']:8.2f} -> {case['ms_per_frame']:8.2f} ms/frame ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--resolutions', nargs='+', default=RESOLUTIONS)
+    parser.add_argument('--densities', nargs='+', type=int, default=DENSITIES,
+                        help="Manchas de relleno por frame sintético")
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--frames', type=int, default=30, help="Frames distintos por caso")
+    parser.add_argument('--repeat', type=int, default=3, help="Pasadas sobre los frames al medir FPS")
+    parser.add_argument('--images', help="Video o directorio de imágenes en lugar de frames sintéticos")
+    parser.add_argument('--output', help="Archivo JSON de resultados (por defecto bench_pipeline-<commit>.json)")
+    parser.add_argument('--compare', help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    densities = ['recorded'] if args.images else args.densities
+    results = {}
+    for resolution in args.resolutions:
+        size = tuple(int(v) for v in resolution.split('x'))
+        for density in densities:
+            if args.images:
+                frames = recorded_frames(args.images, size, args.frames)
+            else:
+                frames = synthetic_frames(size, density, args.frames)
+            for mode in args.modes:
+                key = f"{resolution}/{density}/{mode}"
+                results[key] = case = run_case(mode, frames, args.repeat)
+                stages = ' '.join(f"{name}={stats['p50']:.2f}" for name, stats in case['stages_ms'].items())
+                print(f"{key:<36} {case['fps']:8.1f} fps  hit {case['hit_rate']:.2f}  "
+                      f"alloc {case['alloc_peak_kib']:8.0f} KiB  p50 ms: {stages}")
+
+    commit = git_commit()
+    output = args.output or f"bench_pipeline-{commit or 'local'}.json"
+    with open(output, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'cv_threads': cv2.getNumThreads(),
+            'args': vars(args),
+            'cases': results,
+        }, f, indent=2)
+    print(f"Resultados guardados en {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Costo de la instrumentación por etapa (`app/services/profiler.py`).
+
+Mide una llamada `start`/`stop` suelta y `detect` completo con el profiler
+desactivado y activado.
+
+Uso (desde `backend/`):
+    python -m tests.bench_profiler
+"""
+import time
+import cv2
+import numpy as np
+from app.models.shapes import ShapeType
+from app.services.processing import DetectionParams, detect
+from app.services.profiler import profiler
+
+PARAMS = DetectionParams(np.array([22, 51, 151]), np.array([90, 255, 255]), np.ones((5, 5), np.uint8),
+                         ShapeType.QUADRILATERAL.value, 600)
+REPEAT = 200
+CALLS = 1_000_000
+
+
+def timeit(fn, repeat=REPEAT):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    for enabled in (False, True):
+        profiler.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            profiler.stop('bench', profiler.start())
+        per_call = (time.perf_counter() - start) / CALLS * 1e9
+        print(f"start/stop enabled={enabled}: {per_call:.0f} ns")
+    profiler.reset()
+
+    frame = cv2.imread('tests/imgs/shape.jpg')
+    # Se alterna para que el ruido de la máquina afecte a ambos casos por igual
+    disabled = enabled = 0.
+    for _ in range(5):
+        profiler.enabled = False
+        disabled += timeit(lambda: detect(frame, PARAMS)) / 5
+        profiler.enabled = True
+        enabled += timeit(lambda: detect(frame, PARAMS)) / 5
+    print(f"detect {frame.shape[1]}x{frame.shape[0]}: disabled {disabled * 1000:.3f} ms, "
+          f"enabled {enabled * 1000:.3f} ms ({(enabled / disabled - 1) * 100:+.2f}%)")
+
+    for name, stats in profiler.summary()['stages'].items():
+        if stats:
+            print(f"  {name:<9} p50 {stats['p50']:.3f} ms  p95 {stats['p95']:.3f} ms  p99 {stats['p99']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
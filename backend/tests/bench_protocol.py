@@ -0,0 +1,73 @@
+"""
+Compara bytes por mensaje y tiempo de codificación del UART: línea de texto
+`;` (versión 0) contra el protocolo binario de `app/services/protocol.py`, con
+el objetivo principal solo y con figuras extra (`uart_targets`). También
+verifica que el decodificador recupere los valores con error menor a 1 mm.
+
+Uso (desde `backend/`):
+    python -m tests.bench_protocol
+"""
+import time
+import numpy as np
+from app.services import protocol
+from app.services.processing import detect, shape_code
+from app.services.scenes import SceneGenerator
+from tests.bench_pipeline import base_params
+
+BAUD_RATE = 115200
+EXTRAS = [0, 3]
+SCENES = 50
+REPEAT = 20
+
+
+def text_message(metadata: dict, targets: np.ndarray, extra: int) -> bytes:
+    """Igual que `UART.send_data` con la versión 0."""
+    values = [str(metadata[key]) for key in ('x_dobj', 'y_dobj', 'z_dobj', 'dobj', 'area')]
+    for row in targets[:extra][['shape', 'confidence', 'x', 'y', 'z']].tolist():
+        values.extend(format(v, '.6g') for v in row)
+    return (';'.join(values) + '\n').encode('utf-8')
+
+
+def binary_message(metadata: dict, targets: np.ndarray, extra: int, code: int) -> bytes:
+    records = protocol.make_records(metadata, targets, code, extra)
+    return protocol.encode_data(0, protocol.stamp_ms(time.perf_counter()), records)
+
+
+def samples():
+    """Metadatos y figuras reales: detección sobre escenas sintéticas, con las figuras repetidas."""
+    params = base_params()
+    for scene in SceneGenerator(noise=4, seed=0).random(SCENES):
+        detection = detect(scene.frame, params)
+        if detection.metadata['dobj'] > 0:
+            yield detection.metadata, np.resize(detection.targets, max(EXTRAS) + 1)
+
+
+def main():
+    code = shape_code(base_params().target_shape)
+    data = list(samples())
+    decoder = protocol.FrameDecoder()
+    for metadata, targets in data:
+        (frame,) = decoder.feed(binary_message(metadata, targets, 0, code))
+        (record,) = protocol.decode_records(frame.payload)
+        for field, key in (('x', 'x_dobj'), ('y', 'y_dobj'), ('z', 'z_dobj')):
+            assert abs(record[field] - metadata[key]) <= .05, (field, record[field], metadata[key])
+
+    for extra in EXTRAS:
+        encoders = {
+            'text': lambda metadata, targets: text_message(metadata, targets, extra),
+            'binary': lambda metadata, targets: binary_message(metadata, targets, extra, code),
+        }
+        for name, encode in encoders.items():
+            sizes = []
+            start = time.perf_counter()
+            for _ in range(REPEAT):
+                sizes = [len(encode(metadata, targets)) for metadata, targets in data]
+            elapsed = (time.perf_counter() - start) / (REPEAT * len(data)) * 1e6
+            size = np.mean(sizes)
+            # 10 bits por byte en la línea (inicio + 8 datos + parada)
+            print(f"{extra} extra {name:>6}: {size:6.1f} bytes/mensaje, {elapsed:6.1f} µs/mensaje, "
+                  f"máx {BAUD_RATE / 10 / size:6.0f} mensajes/s a {BAUD_RATE} baudios")
+
+
+if __name__ == "__main__":
+    main()
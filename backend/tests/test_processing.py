@@ -0,0 +1,21 @@
+import cv2
+import numpy as np
+from app.services.processing import MAX_TARGETS, detect
+from app.services.scenes import TARGET_COLOR
+from tests.bench_pipeline import base_params
+
+
+def cluttered_frame() -> np.ndarray:
+    """Cuadrado objetivo y 24 círculos dentro del rango HSV (más contornos que `MAX_TARGETS`)."""
+    frame = np.zeros((720, 1280, 3), np.uint8)
+    for i in range(24):
+        cv2.circle(frame, (80 + (i % 8) * 150, 100 + (i // 8) * 150), 30, TARGET_COLOR, -1)
+    cv2.rectangle(frame, (600, 560), (700, 660), TARGET_COLOR, -1)
+    return frame
+
+
+def test_candidate_filter_keeps_target_in_clutter():
+    detection = detect(cluttered_frame(), base_params(candidate_filter=True))
+    assert detection.hit is not None
+    assert len(detection.targets) == MAX_TARGETS
+    assert abs(detection.metadata['x_dobj']) < 5
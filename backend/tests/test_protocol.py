@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+from app.services import protocol
+from app.services.processing import TARGET_DTYPE
+
+
+class FakePort:
+    """Puerto serie en memoria: `rx` es lo que envía el ESP32, `tx` lo que escribe la cámara."""
+
+    def __init__(self):
+        self.is_open = True
+        self.rx = bytearray()
+        self.tx = bytearray()
+        self.out_waiting = 0
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.rx)
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytes(self.rx[:size])
+        del self.rx[:size]
+        return data
+
+    def write(self, data: bytes) -> int:
+        self.tx += data
+        return len(data)
+
+
+@pytest.fixture
+def uart():
+    from app.services.uart import UART
+    UART._instance = None
+    instance = UART()
+    instance.serial_port = FakePort()
+    instance.prefer_streaming = False
+    instance.targets = 0
+    yield instance
+    UART._instance = None
+
+
+def metadata(z: float = 150.) -> dict:
+    return {'x_dobj': 1.5, 'y_dobj': -2., 'z_dobj': z, 'dobj': z, 'area': 1200.}
+
+
+def test_crc16_known_vector():
+    # Valor de referencia de CRC-16/CCITT-FALSE
+    assert protocol.crc16(b'123456789') == 0x29B1
+
+
+def test_decodes_frame_fed_byte_by_byte():
+    records = protocol.make_records(metadata(), np.empty(0, TARGET_DTYPE), 1)
+    data = protocol.encode_data(7, 123456, records)
+    decoder = protocol.FrameDecoder()
+    frames = []
+    for byte in data:
+        frames.extend(decoder.feed(bytes([byte])))
+    (frame,) = frames
+    assert (frame.kind, frame.seq, frame.stamp) == (protocol.DATA, 7, 123456)
+    (record,) = protocol.decode_records(frame.payload)
+    assert (record['x'], record['y'], record['z']) == (1.5, -2., 150.)
+    assert decoder.errors == 0
+
+
+def test_rejects_bad_crc_and_resyncs():
+    good = protocol.encode_frame(protocol.READY, seq=2)
+    bad = bytearray(protocol.encode_frame(protocol.READY, seq=1))
+    bad[-1] ^= 0xFF
+    decoder = protocol.FrameDecoder()
+    frames = decoder.feed(bytes(bad) + good)
+    assert [frame.seq for frame in frames] == [2]
+    assert decoder.errors == 1
+
+
+def test_make_records_saturates():
+    targets = np.zeros(1, TARGET_DTYPE)
+    targets['shape'], targets['confidence'], targets['x'], targets['z'] = 1, 2., -99999., 99999.
+    data = {'x_dobj': 99999., 'y_dobj': -99999., 'z_dobj': -5., 'dobj': 1., 'area': -1., 'vz': 1e9}
+    records = protocol.make_records(data, targets, 1, extra=1)
+    assert records[0]['confidence'] == 255
+    assert (records[0]['x'], records[0]['y'], records[0]['z']) == (32767, -32768, 0)
+    assert (records[0]['vz'], records[0]['area']) == (32767, 0)
+    assert records[1]['confidence'] == 255
+    assert (records[1]['x'], records[1]['z']) == (-32768, 65535)
+
+
+def test_negotiates_binary_protocol(uart):
+    uart.serial_port.rx += protocol.encode_frame(protocol.HELLO, payload=bytes([protocol.VERSION + 1]))
+    uart.receive_data()
+    (accept,) = protocol.FrameDecoder().feed(bytes(uart.serial_port.tx))
+    assert accept.kind == protocol.ACCEPT
+    assert accept.payload == bytes([protocol.VERSION, 0])
+    assert uart.version == protocol.VERSION
+    # Sin READY no se envía nada
+    assert not uart.send_data(metadata())
+
+    uart.serial_port.tx.clear()
+    uart.serial_port.rx += protocol.encode_frame(protocol.READY)
+    uart.receive_data()
+    assert uart.send_data(metadata())
+    (data,) = protocol.FrameDecoder().feed(bytes(uart.serial_port.tx))
+    assert data.kind == protocol.DATA
+    assert protocol.decode_records(data.payload)[0]['z'] == 150.
+    # Cada READY habilita un solo mensaje
+    assert not uart.send_data(metadata())
+
+
+def test_falls_back_to_legacy_text(uart):
+    uart.serial_port.rx += (protocol.LEGACY_HANDSHAKE + '\n').encode('utf-8')
+    uart.receive_data()
+    assert uart.version == protocol.LEGACY_VERSION
+    assert uart.send_data(metadata())
+    assert bytes(uart.serial_port.tx) == b'1.5;-2.0;150.0;150.0;1200.0\n'
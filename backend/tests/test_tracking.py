@@ -0,0 +1,44 @@
+import numpy as np
+from app.services.processing import TARGET_DTYPE
+from app.services.tracking import MIN_Z, TargetTracker
+
+DT = 1 / 30
+
+
+def targets(x: float, y: float, z: float, shape: int = 1) -> np.ndarray:
+    rows = np.zeros(1, TARGET_DTYPE)
+    rows['shape'], rows['confidence'], rows['x'], rows['y'], rows['z'] = shape, 1., x, y, z
+    return rows
+
+
+def test_predicts_through_dropout():
+    tracker = TargetTracker()
+    for i in range(30):
+        tracker.update(targets(i * .5, 0., 150.), i * DT, primary_shape=1)
+    last = tracker.metadata({})['x_dobj']
+    tracker.update(targets(0, 0, 0)[:0], 30 * DT, primary_shape=1)
+    metadata = tracker.metadata({})
+    assert metadata['missed'] == 1
+    assert metadata['x_dobj'] > last
+    assert abs(metadata['vx'] - 15.) < 1.
+
+
+def test_approaching_target_never_publishes_negative_distance():
+    tracker = TargetTracker(max_missed=30)
+    # Se acerca a 300 cm/s y se pierde a unos 30 cm de la cámara
+    stamp = 0.
+    for i in range(20):
+        stamp = i * DT
+        tracker.update(targets(0., 0., 220. - 300. * stamp), stamp, primary_shape=1)
+    assert tracker.metadata({})['vz'] < -250.
+
+    for i in range(20, 40):
+        stamp = i * DT
+        rows = tracker.update(targets(0, 0, 0)[:0], stamp, primary_shape=1)
+        metadata = tracker.metadata({})
+        assert metadata['dobj'] == metadata['z_dobj']
+        assert metadata['dobj'] == 0. or metadata['dobj'] > MIN_Z
+        assert (rows['z'] > MIN_Z).all()
+    # El track se descartó en vez de pasar detrás de la cámara
+    assert tracker.primary is None
+    assert len(tracker.predict(stamp + 1.)) == 0
@@ -0,0 +1,85 @@
+// Decodificador del stream binario de máscaras (/detection/mask-bits).
+// Cada máscara llega con una cabecera de 12 bytes (little endian):
+//   magic "MK" | versión (u8) | formato (u8) | ancho (u16) | alto (u16) | largo del payload (u32)
+// El payload son los bits de la máscara (1 bit por píxel, MSB primero) comprimidos con zlib.
+const HEADER_SIZE = 12;
+const FORMAT_BITS = 1;
+
+async function inflate(payload) {
+    const stream = new Blob([payload]).stream().pipeThrough(new DecompressionStream("deflate"));
+    return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+function drawMask(ctx, bits, width, height) {
+    if (ctx.canvas.width !== width || ctx.canvas.height !== height) {
+        ctx.canvas.width = width;
+        ctx.canvas.height = height;
+    }
+    const image = ctx.createImageData(width, height);
+    const pixels = new Uint32Array(image.data.buffer);
+    const total = width * height;
+    for (let i = 0; i < total; i++) {
+        const on = (bits[i >> 3] >> (7 - (i & 7))) & 1;
+        pixels[i] = on ? 0xffffffff : 0xff000000;
+    }
+    ctx.putImageData(image, 0, 0);
+}
+
+async function streamMask(url, canvas, stats) {
+    const ctx = canvas.getContext("2d");
+    const response = await fetch(url);
+    const reader = response.body.getReader();
+    let buffer = new Uint8Array(0);
+    let frames = 0;
+    let bytes = 0;
+    let start = performance.now();
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        // Acumular lo recibido hasta tener máscaras completas
+        const merged = new Uint8Array(buffer.length + value.length);
+        merged.set(buffer);
+        merged.set(value, buffer.length);
+        buffer = merged;
+
+        while (buffer.length >= HEADER_SIZE) {
+            const view = new DataView(buffer.buffer, buffer.byteOffset, HEADER_SIZE);
+            if (view.getUint8(0) !== 0x4d || view.getUint8(1) !== 0x4b) {
+                throw new Error("Cabecera de máscara inválida");
+            }
+            const format = view.getUint8(3);
+            const width = view.getUint16(4, true);
+            const height = view.getUint16(6, true);
+            const length = view.getUint32(8, true);
+            if (buffer.length < HEADER_SIZE + length) break;
+
+            const payload = buffer.subarray(HEADER_SIZE, HEADER_SIZE + length);
+            buffer = buffer.slice(HEADER_SIZE + length);
+            if (format !== FORMAT_BITS) continue;
+
+            drawMask(ctx, await inflate(payload), width, height);
+            frames += 1;
+            bytes += HEADER_SIZE + length;
+        }
+
+        const elapsed = (performance.now() - start) / 1000;
+        if (elapsed >= 1) {
+            stats.textContent = `${(frames / elapsed).toFixed(1)} fps, ${Math.round(bytes / Math.max(frames, 1))} bytes/máscara`;
+            frames = 0;
+            bytes = 0;
+            start = performance.now();
+        }
+    }
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+    const canvas = document.getElementById("mask-canvas");
+    const stats = document.getElementById("mask-stats");
+
+    streamMask("/detection/mask-bits", canvas, stats).catch((error) => {
+        console.error("Error en el stream de la máscara: ", error);
+        stats.textContent = "Error en el stream de la máscara.";
+    });
+});
@@ -11,28 +11,21 @@ document.addEventListener("DOMContentLoaded", () => {
     const btnTriangle = document.getElementById("btn-triangle");
     const btnCircle = document.getElementById("btn-circle");
 
-    async function fetchMetadata() {
-        try {
-            const response = await fetch("/detection/metadata");
-            if (response.ok) {
-                const metadata = await response.json();
-
-                // Renderizar los datos en el contenedor
-                metadataContainer.innerHTML = Object.entries(metadata)
-                    .map(([key, value]) => {
-                        const formattedValue = typeof value === 'number' ? value.toFixed(2) : value;
-                        return `<p><strong>${key}:</strong> ${formattedValue}</p>`;
-                    })
-                    .join("");
-            } else {
-                console.error("Error al obtener los datos del metadata.");
-            }
-        } catch (error) {
-            console.error("Error en la solicitud de metadata: ", error);
-        }
+    function renderMetadata(metadata) {
+        // Renderizar los datos en el contenedor
+        metadataContainer.innerHTML = Object.entries(metadata)
+            .map(([key, value]) => {
+                const formattedValue = typeof value === 'number' ? value.toFixed(2) : value;
+                return `<p><strong>${key}:</strong> ${formattedValue}</p>`;
+            })
+            .join("");
     }
 
-    setInterval(fetchMetadata, 1000);
+    // El servidor envía la metadata de cada frame nuevo (como máximo 10 por segundo).
+    // EventSource se reconecta solo si se corta la conexión.
+    const metadataEvents = new EventSource("/detection/metadata/stream?max_rate=10");
+    metadataEvents.onmessage = (event) => renderMetadata(JSON.parse(event.data));
+    metadataEvents.onerror = () => console.error("Se perdió la conexión del stream de metadata.");
 
     function updateShape(shape) {
         fetch(`/control/update-shape?shape=${shape}`, {
@@ -63,7 +56,7 @@ document.addEventListener("DOMContentLoaded", () => {
     });
 
     btnMask.addEventListener("click", () => {
-        video.src = "/detection/mask"; // Cambia la fuente a la máscara
+        video.src = "/detection/mask?format=png"; // Cambia la fuente a la máscara (PNG sin pérdida)
     });
 
     // Obtener los valores HSV iniciales desde el servidor